@@ -1,7 +1,11 @@
 from django.contrib import admin
 from django.db.models import QuerySet
 from django.http import HttpRequest
+from django.utils import timezone
 
+from . import cache
+from .banners import BANNERS_CACHE_KEY
+from .menu import refresh_active
 from .models import *
 
 
@@ -31,28 +35,52 @@ class OrderItemInline(admin.TabularInline):
 def mark_limited(
     modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet
 ):
-    queryset.update(limited=True)
+    queryset.update(limited=True, updated_at=timezone.now())
 
 
 @admin.action(description="Убрать метку ограниченного тиража")
 def mark_unlimited(
     modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet
 ):
-    queryset.update(limited=False)
+    queryset.update(limited=False, updated_at=timezone.now())
+
+
+@admin.action(description="Показывать в баннерах")
+def mark_banner(modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet):
+    queryset.update(banner=True, updated_at=timezone.now())
+    cache.invalidate(BANNERS_CACHE_KEY)
+
+
+@admin.action(description="Убрать из баннеров")
+def mark_not_banner(
+    modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet
+):
+    queryset.update(banner=False, updated_at=timezone.now())
+    cache.invalidate(BANNERS_CACHE_KEY)
 
 
 @admin.action(description="Добавить в опубликованное")
 def mark_published(
     modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet
 ):
-    queryset.update(is_published=True)
+    queryset.update(is_published=True, updated_at=timezone.now())
+    refresh_active(
+        queryset.values_list("category_id", flat=True),
+        queryset.values_list("subcategory_id", flat=True),
+    )
+    cache.invalidate(BANNERS_CACHE_KEY)
 
 
 @admin.action(description="Убрать из опубликованого")
 def mark_unpublished(
     modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet
 ):
-    queryset.update(is_published=False)
+    queryset.update(is_published=False, updated_at=timezone.now())
+    refresh_active(
+        queryset.values_list("category_id", flat=True),
+        queryset.values_list("subcategory_id", flat=True),
+    )
+    cache.invalidate(BANNERS_CACHE_KEY)
 
 
 @admin.register(Market)
@@ -100,6 +128,8 @@ class ItemAdmin(admin.ModelAdmin):
         mark_unlimited,
         mark_published,
         mark_unpublished,
+        mark_banner,
+        mark_not_banner,
     ]
     inlines = [
         ItemImageInline,
@@ -161,9 +191,9 @@ class ItemAdmin(admin.ModelAdmin):
         (
             "Доп. опции",
             {
-                "fields": ("limited",),
+                "fields": ("limited", "banner"),
                 "classes": ("collapse",),
-                "description": 'Дополнительные опции. Поле "limited" для пометки товара ограниченного тиража.',
+                "description": 'Дополнительные опции. Поле "limited" для пометки товара ограниченного тиража, поле "banner" для показа товара в баннерах на главной странице.',
             },
         ),
     ]
@@ -0,0 +1,43 @@
+import datetime
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from . import cache
+from .models import Category, Item
+from .serializers import CatalogSerializer
+
+BANNERS_CACHE_KEY = "banners"
+BANNERS_LIMIT = 4
+
+
+def build_banners() -> list:
+    items = Item.objects.filter(is_published=True, banner=True).order_by(
+        "sort_index", "id"
+    )[:BANNERS_LIMIT]
+    if not items:
+        top_items = Category.objects.filter(active=True).annotate(
+            top_item=Subquery(
+                Item.objects.filter(category_id=OuterRef("pk"), is_published=True)
+                .order_by("-rating_avg", "-id")
+                .values("id")[:1]
+            )
+        )
+        items = Item.objects.filter(
+            id__in=top_items.values("top_item")[:BANNERS_LIMIT]
+        ).order_by("-rating_avg", "-id")
+    return CatalogSerializer(items, many=True).data
+
+
+def get_banners(stamp: datetime.datetime = None) -> list:
+    """
+    Возвращает баннеры из кеша, stamp - время последнего изменения каталога,
+    по которому баннеры пересобираются после изменения рейтинга или цены
+    """
+
+    return cache.get_or_build(
+        BANNERS_CACHE_KEY,
+        build_banners,
+        settings.BANNERS_CACHE_TIMEOUT,
+        key=f"{BANNERS_CACHE_KEY}:{stamp.timestamp() if stamp else None}",
+    )
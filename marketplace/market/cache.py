@@ -0,0 +1,30 @@
+import time
+from typing import Any, Callable, Optional
+
+from django.core.cache import cache
+
+
+def get_version(name: str) -> int:
+    """Возвращает текущую версию закешированного ресурса"""
+
+    return cache.get_or_set(f"{name}:version", time.time_ns, None)
+
+
+def invalidate(name: str) -> None:
+    """Делает устаревшими все закешированные значения ресурса"""
+
+    try:
+        cache.incr(f"{name}:version")
+    except ValueError:
+        cache.set(f"{name}:version", time.time_ns(), None)
+
+
+def get_or_build(
+    name: str,
+    build: Callable[[], Any],
+    timeout: Optional[int],
+    key: Optional[str] = None,
+) -> Any:
+    """Возвращает значение из кеша для текущей версии ресурса или строит его"""
+
+    return cache.get_or_set(key or name, build, timeout, version=get_version(name))
@@ -0,0 +1,82 @@
+import datetime
+from typing import Callable
+
+from django.db.models import Max, QuerySet
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from . import cache
+from .models import Category, Item, Sales
+
+
+def get_last_modified(*querysets: QuerySet) -> datetime.datetime:
+    """Последнее время изменения записей querysets"""
+
+    stamps = [
+        queryset.aggregate(stamp=Max("updated_at"))["stamp"] for queryset in querysets
+    ]
+    return max(filter(None, stamps), default=None)
+
+
+def start_of_day() -> datetime.datetime:
+    return timezone.make_aware(
+        datetime.datetime.combine(timezone.localdate(), datetime.time())
+    )
+
+
+def get_request_stamp(request, get_stamp: Callable, *args, **kwargs):
+    """Метка ресурса, вычисляемая один раз за запрос"""
+
+    if not hasattr(request, "_resource_stamp"):
+        request._resource_stamp = get_stamp(request, *args, **kwargs)
+    return request._resource_stamp
+
+
+def conditional(get_stamp: Callable) -> Callable:
+    """
+    Добавляет к GET-запросам представления ETag и Last-Modified по метке
+    ресурса и отвечает 304, не сериализуя данные, пока метка не изменится.
+    Метка - время последнего изменения или версия закешированного ресурса
+    """
+
+    def get_etag(request, *args, **kwargs):
+        stamp = get_request_stamp(request, get_stamp, *args, **kwargs)
+        if isinstance(stamp, datetime.datetime):
+            return str(stamp.timestamp())
+        return None if stamp is None else str(stamp)
+
+    def get_last_modified_stamp(request, *args, **kwargs):
+        stamp = get_request_stamp(request, get_stamp, *args, **kwargs)
+        return stamp if isinstance(stamp, datetime.datetime) else None
+
+    return method_decorator(
+        condition(etag_func=get_etag, last_modified_func=get_last_modified_stamp),
+        name="get",
+    )
+
+
+def get_catalog_stamp(request, *args, **kwargs) -> datetime.datetime:
+    return get_last_modified(Item.objects.all(), Category.objects.all())
+
+
+def get_item_stamp(request, id: int, *args, **kwargs) -> datetime.datetime:
+    return get_last_modified(
+        Item.objects.filter(id=id), Category.objects.filter(item__id=id)
+    )
+
+
+def get_sales_stamp(request, *args, **kwargs) -> datetime.datetime:
+    """Распродажи начинаются и заканчиваются в начале дня"""
+
+    stamp = get_last_modified(
+        Sales.objects.all(), Item.objects.all(), Category.objects.all()
+    )
+    return max(stamp, start_of_day()) if stamp else start_of_day()
+
+
+def get_version_stamp(name: str) -> Callable:
+    def get_stamp(request, *args, **kwargs) -> int:
+        return cache.get_version(name)
+
+    return get_stamp
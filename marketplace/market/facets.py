@@ -0,0 +1,65 @@
+from collections import Counter
+
+from django.db.models import BooleanField, Case, Count, IntegerField, QuerySet, When
+
+PRICE_BUCKETS = (0, 100, 500, 1000, 5000, 10000, 50000)
+
+
+def get_facet_rows(items: QuerySet) -> QuerySet:
+    """Кол-во товаров, сгруппированное по всем измерениям фасетов"""
+
+    return (
+        items.order_by()
+        .annotate(
+            price_bucket=Case(
+                *[
+                    When(effective_price__lt=upper, then=index)
+                    for index, upper in enumerate(PRICE_BUCKETS[1:])
+                ],
+                default=len(PRICE_BUCKETS) - 1,
+                output_field=IntegerField(),
+            ),
+            in_stock=Case(
+                When(quantity=0, then=False),
+                default=True,
+                output_field=BooleanField(),
+            ),
+        )
+        .values(
+            "category_id", "subcategory_id", "price_bucket", "free_delivery", "in_stock"
+        )
+        .annotate(count=Count("id"))
+    )
+
+
+def build_facets(items: QuerySet) -> dict:
+    """
+    Считает кол-во товаров по категориям, подкатегориям, диапазонам цен,
+    бесплатной доставке и наличию одним сгруппированным запросом
+    """
+
+    categories, subcategories, prices = Counter(), Counter(), Counter()
+    free_delivery = available = 0
+    for row in get_facet_rows(items):
+        categories[row["category_id"]] += row["count"]
+        if row["subcategory_id"] is not None:
+            subcategories[row["subcategory_id"]] += row["count"]
+        prices[row["price_bucket"]] += row["count"]
+        free_delivery += row["count"] if row["free_delivery"] else 0
+        available += row["count"] if row["in_stock"] else 0
+
+    bounds = PRICE_BUCKETS[1:] + (None,)
+    return {
+        "categories": [
+            {"id": id, "count": count} for id, count in sorted(categories.items())
+        ],
+        "subcategories": [
+            {"id": id, "count": count} for id, count in sorted(subcategories.items())
+        ],
+        "prices": [
+            {"min": lower, "max": upper, "count": prices[index]}
+            for index, (lower, upper) in enumerate(zip(PRICE_BUCKETS, bounds))
+        ],
+        "freeDelivery": free_delivery,
+        "available": available,
+    }
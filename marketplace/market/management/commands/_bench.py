@@ -0,0 +1,104 @@
+import random
+import statistics
+import threading
+import time
+from typing import Callable
+
+from django.db import OperationalError, connection
+
+from market import search
+from market.models import Category, Item, Market, SubCategory
+
+BATCH_SIZE = 5000
+
+
+def populate_items(total: int) -> None:
+    """Дополняет каталог синтетическими товарами до заданного кол-ва"""
+
+    market, _ = Market.objects.get_or_create(title="Benchmark")
+    categories = [
+        Category.objects.get_or_create(title=f"Benchmark {index}")[0]
+        for index in range(10)
+    ]
+    subcategories = [
+        SubCategory.objects.get_or_create(
+            title=f"Benchmark {category.pk}.{index}", category=category
+        )[0]
+        for category in categories
+        for index in range(5)
+    ]
+    start = Item.objects.count()
+    for offset in range(start, total, BATCH_SIZE):
+        batch = []
+        for number in range(offset, min(offset + BATCH_SIZE, total)):
+            subcategory = random.choice(subcategories)
+            reviews = random.randint(0, 20)
+            price = random.randint(1, 100000)
+            batch.append(
+                Item(
+                    name=f"Benchmark item {number}",
+                    description=f"Описание товара {number}",
+                    price=price,
+                    effective_price=price,
+                    quantity=random.randint(0, 10),
+                    sort_index=random.randint(0, 100),
+                    is_published=random.random() < 0.9,
+                    free_delivery=random.random() < 0.3,
+                    limited=random.random() < 0.01,
+                    banner=random.random() < 0.001,
+                    popularity=random.random() * 100,
+                    market=market,
+                    category_id=subcategory.category_id,
+                    subcategory=subcategory,
+                    review_count=reviews,
+                    rating_sum=reviews * 3,
+                    rating_avg=3 if reviews else 0,
+                )
+            )
+        created = Item.objects.bulk_create(batch)
+        search.index_items(item.pk for item in created)
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """Возвращает медиану времени выполнения в миллисекундах"""
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def explain(queryset) -> str:
+    if connection.vendor == "sqlite":
+        return queryset.explain()
+    return queryset.explain(analyze=True)
+
+
+def reserve_concurrently(orders: list, threads: int) -> list:
+    """Резервирует товар заказов из нескольких потоков, результаты reserve_stock"""
+
+    results = []
+
+    def worker(chunk: list) -> None:
+        try:
+            for order in chunk:
+                while True:
+                    try:
+                        results.append(order.reserve_stock())
+                        break
+                    except OperationalError:
+                        time.sleep(0.001)
+        finally:
+            connection.close()
+
+    workers = [
+        threading.Thread(target=worker, args=(orders[index::threads],))
+        for index in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
@@ -0,0 +1,63 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from market import search
+from market.models import Item, Order, Review, Sales, SubCategory
+
+from ._bench import explain, measure, populate_items
+
+
+class Command(BaseCommand):
+    help = "Замеряет планы и время запросов каталога на синтетических данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[10000, 100000, 1000000]
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for size in options["sizes"]:
+                populate_items(size)
+                self.stdout.write(self.style.MIGRATE_HEADING(f"Товаров: {size}"))
+                for name, queryset in self.get_querysets().items():
+                    latency = measure(lambda: list(queryset.all()), options["repeat"])
+                    self.stdout.write(f"{name}: {latency:.2f} ms")
+                    self.stdout.write(explain(queryset))
+            transaction.set_rollback(True)
+
+    def get_querysets(self) -> dict:
+        backend = search.get_backend()
+        published = Item.objects.filter(is_published=True)
+        subcategory = SubCategory.objects.filter(title__startswith="Benchmark").first()
+        price_range = published.filter(
+            effective_price__gt=100, effective_price__lt=50000
+        )
+        return {
+            "catalog price": price_range.order_by("effective_price")[:20],
+            "catalog date": price_range.order_by("-created_at")[:20],
+            "catalog rating": price_range.order_by("-rating_avg", "-id")[:20],
+            "catalog reviews": price_range.order_by("-review_count", "-id")[:20],
+            "catalog free delivery": price_range.filter(free_delivery=True).order_by(
+                "effective_price"
+            )[:20],
+            "catalog available": price_range.exclude(quantity=0).order_by(
+                "effective_price"
+            )[:20],
+            "catalog category": price_range.filter(
+                category_id=subcategory.category_id
+            ).order_by("effective_price")[:20],
+            "catalog subcategory": price_range.filter(
+                subcategory_id=subcategory.id
+            ).order_by("effective_price")[:20],
+            "catalog name": backend.search(price_range, "4242")[:20],
+            "catalog name common": backend.search(price_range, "Описание")[:20],
+            "popular": published.order_by("-popularity", "-id")[:8],
+            "banners": published.filter(banner=True).order_by("sort_index", "id")[:4],
+            "limited": published.filter(limited=True)[:16],
+            "item reviews": Review.objects.filter(item_id=1).order_by("-rate"),
+            "item sales": Sales.objects.filter(item_id=1),
+            "orders": Order.objects.filter(user_id=1).order_by("-created_at"),
+            "orders status": Order.objects.filter(status="not_accepted"),
+        }
@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from market.models import Item
+from market.views import OrdersListView
+from users.models import Profile
+
+from ._bench import measure, populate_items
+
+
+class Command(BaseCommand):
+    help = "Замеряет время оформления заказа для корзин разного размера"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", nargs="+", type=int, default=[1, 10, 100])
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            populate_items(max(options["lines"]))
+            user = User.objects.create_user("benchmark", "benchmark@example.com")
+            Profile.objects.create(user=user)
+            items = list(Item.objects.order_by("id")[: max(options["lines"])])
+            view = OrdersListView.as_view()
+            factory = APIRequestFactory()
+
+            for lines in options["lines"]:
+                cart = [
+                    {"id": item.id, "price": str(item.price), "count": 1}
+                    for item in items[:lines]
+                ]
+
+                def checkout():
+                    request = factory.post("/api/orders", cart, format="json")
+                    request.user = user
+                    force_authenticate(request, user)
+                    view(request)
+
+                with CaptureQueriesContext(connection) as queries:
+                    checkout()
+                latency = measure(checkout, options["repeat"])
+                self.stdout.write(
+                    f"Позиций: {lines}: {latency:.2f} ms, запросов: {len(queries)}"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from market import search
+from market.facets import build_facets, get_facet_rows
+from market.models import Item
+
+from ._bench import explain, measure, populate_items
+
+
+class Command(BaseCommand):
+    help = "Замеряет план и время подсчета фасетов каталога на синтетических данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[100000])
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for size in options["sizes"]:
+                populate_items(size)
+                self.stdout.write(self.style.MIGRATE_HEADING(f"Товаров: {size}"))
+                for name, queryset in self.get_querysets().items():
+                    latency = measure(lambda: build_facets(queryset), options["repeat"])
+                    self.stdout.write(f"{name}: {latency:.2f} ms")
+                    self.stdout.write(explain(get_facet_rows(queryset)))
+            transaction.set_rollback(True)
+
+    def get_querysets(self) -> dict:
+        published = Item.objects.filter(is_published=True)
+        price_range = published.filter(
+            effective_price__gt=100, effective_price__lt=50000
+        )
+        return {
+            "facets all": published,
+            "facets price": price_range,
+            "facets free delivery": price_range.filter(free_delivery=True),
+            "facets available": price_range.exclude(quantity=0),
+            "facets name": search.get_backend().search(price_range, "4242"),
+        }
@@ -0,0 +1,60 @@
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+
+from market.models import Category, Item, Market, Order, OrderItem
+
+from ._bench import reserve_concurrently
+
+
+class Command(BaseCommand):
+    help = "Замеряет скорость резервирования товара при конкурентных заказах"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stock", type=int, default=100)
+        parser.add_argument("--orders", type=int, default=300)
+        parser.add_argument("--threads", type=int, default=8)
+
+    def handle(self, *args, **options):
+        name = f"Benchmark reservation {uuid.uuid4().hex}"
+        try:
+            self.run(name, options)
+        finally:
+            Order.objects.filter(user__username=name).update(reserved=False)
+            Order.objects.filter(user__username=name).delete()
+            Market.objects.filter(title=name).delete()
+            Category.objects.filter(title=name).delete()
+            User.objects.filter(username=name).delete()
+
+    def run(self, name: str, options: dict) -> None:
+        market = Market.objects.create(title=name)
+        category = Category.objects.create(title=name)
+        item = Item.objects.create(
+            name=name,
+            market=market,
+            category=category,
+            quantity=options["stock"],
+            is_published=True,
+        )
+        user = User.objects.create_user(name)
+        orders = []
+        for _ in range(options["orders"]):
+            order = Order.objects.create(user=user, totalCost=item.price)
+            OrderItem.objects.create(item=item, price=item.price, count=1, order=order)
+            orders.append(order)
+
+        started = time.perf_counter()
+        results = reserve_concurrently(orders, options["threads"])
+        elapsed = time.perf_counter() - started
+
+        item.refresh_from_db()
+        reserved = results.count(True)
+        self.stdout.write(
+            f"Зарезервировано: {reserved}, отказов: {len(results) - reserved}, "
+            f"остаток: {item.quantity}, заказов/с: {len(orders) / elapsed:.0f}"
+        )
+        expected = min(options["stock"], options["orders"])
+        if reserved != expected or item.quantity != options["stock"] - expected:
+            raise CommandError("Товар продан сверх остатка")
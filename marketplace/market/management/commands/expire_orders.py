@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from market.models import Order
+
+
+class Command(BaseCommand):
+    help = "Удаляет неоплаченные заказы с истекшим сроком, запускается периодически"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        expired = 0
+        while True:
+            batch = Order.expire(options["batch_size"])
+            expired += batch
+            if batch < options["batch_size"]:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Удалено заказов: {expired}"))
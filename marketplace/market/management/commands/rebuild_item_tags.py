@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from market.models import Item
+
+
+class Command(BaseCommand):
+    help = "Пересобирает индекс тэгов товаров по тэгам их категорий"
+
+    def handle(self, *args, **options):
+        created = Item.objects.refresh_tags()
+        self.stdout.write(self.style.SUCCESS(f"Создано записей индекса: {created}"))
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from market.models import Item
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает рейтинг и кол-во отзывов всех товаров"
+
+    def handle(self, *args, **options):
+        updated = Item.objects.rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Обновлено товаров: {updated}"))
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from market import search
+
+
+class Command(BaseCommand):
+    help = "Перестраивает поисковый индекс каталога"
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано товаров: {indexed}"))
@@ -0,0 +1,15 @@
+from django.core.management import BaseCommand
+
+from market import cache
+from market.menu import MENU_CACHE_KEY
+from market.models import Category, SubCategory
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает статус активности категорий и подкатегорий"
+
+    def handle(self, *args, **options):
+        updated = Category.objects.refresh_active()
+        updated += SubCategory.objects.refresh_active()
+        cache.invalidate(MENU_CACHE_KEY)
+        self.stdout.write(self.style.SUCCESS(f"Изменено категорий: {updated}"))
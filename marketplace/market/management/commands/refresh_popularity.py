@@ -0,0 +1,19 @@
+import datetime
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from market.models import Item
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает популярность товаров, запускается периодически"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.POPULARITY_WINDOW_DAYS)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - datetime.timedelta(days=options["days"])
+        updated = Item.objects.refresh_popularity(since)
+        self.stdout.write(self.style.SUCCESS(f"Обновлено товаров: {updated}"))
@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from market import cache
+from market.models import Item
+from market.prices import SALES_CACHE_KEY
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает итоговые цены товаров, запускается ежедневно"
+
+    def handle(self, *args, **options):
+        updated = Item.objects.refresh_effective_prices()
+        cache.invalidate(SALES_CACHE_KEY)
+        self.stdout.write(self.style.SUCCESS(f"Обновлено товаров: {updated}"))
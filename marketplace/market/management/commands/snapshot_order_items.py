@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+
+from market.models import Item, OrderItem
+from market.serializers import build_snapshots
+
+
+class Command(BaseCommand):
+    help = "Сохраняет снимки товаров в позициях заказов, созданных без них"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        updated = 0
+        while True:
+            lines = list(OrderItem.objects.filter(snapshot={})[: options["batch_size"]])
+            if not lines:
+                break
+            items = Item.objects.filter(id__in={line.item_id for line in lines})
+            snapshots = build_snapshots(items)
+            for line in lines:
+                line.snapshot = snapshots[line.item_id]
+            updated += OrderItem.objects.bulk_update(lines, ["snapshot"])
+        self.stdout.write(self.style.SUCCESS(f"Обновлено позиций: {updated}"))
@@ -0,0 +1,50 @@
+from typing import Iterable
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from . import cache
+from .models import Category, SubCategory
+
+MENU_CACHE_KEY = "categories_menu"
+
+
+def build_menu() -> list:
+    categories = Category.objects.filter(active=True).prefetch_related(
+        Prefetch(
+            "subcategory_set",
+            queryset=SubCategory.objects.filter(active=True),
+            to_attr="active_subcategories",
+        )
+    )
+    return [
+        {
+            "id": category.id,
+            "title": category.title,
+            "image": {"src": category.image_url, "alt": "Image alt string"},
+            "subcategories": [
+                {
+                    "id": subcategory.id,
+                    "title": subcategory.title,
+                    "image": {
+                        "src": subcategory.image_url,
+                        "alt": "Image alt string",
+                    },
+                }
+                for subcategory in category.active_subcategories
+            ],
+        }
+        for category in categories
+    ]
+
+
+def get_menu() -> list:
+    return cache.get_or_build(MENU_CACHE_KEY, build_menu, settings.MENU_CACHE_TIMEOUT)
+
+
+def refresh_active(category_ids: Iterable[int], subcategory_ids: Iterable[int]) -> None:
+    """Пересчитывает статус активности категорий и сбрасывает кеш меню"""
+
+    Category.objects.filter(id__in=set(category_ids)).refresh_active()
+    SubCategory.objects.filter(id__in=set(subcategory_ids)).refresh_active()
+    cache.invalidate(MENU_CACHE_KEY)
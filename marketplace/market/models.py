@@ -1,6 +1,28 @@
+import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    Exists,
+    F,
+    FloatField,
+    Min,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import Exact
+from django.utils import timezone
 from taggit.managers import TaggableManager
+from taggit.models import Tag, TaggedItem
 
 
 class Market(models.Model):
@@ -15,6 +37,33 @@ class Market(models.Model):
         return f'Market(pk="{self.pk}", title="{self.title}")'
 
 
+class ActiveQuerySet(models.QuerySet):
+    item_field = None
+
+    def refresh_active(self) -> int:
+        """Выставляет статус активности по наличию опубликованных товаров"""
+
+        has_items = Exists(
+            Item.objects.filter(**{self.item_field: OuterRef("pk")}, is_published=True)
+        )
+        now = timezone.now()
+        activated = self.filter(has_items, active=False).update(
+            active=True, updated_at=now
+        )
+        deactivated = self.filter(~has_items, active=True).update(
+            active=False, updated_at=now
+        )
+        return activated + deactivated
+
+
+class CategoryQuerySet(ActiveQuerySet):
+    item_field = "category_id"
+
+
+class SubCategoryQuerySet(ActiveQuerySet):
+    item_field = "subcategory_id"
+
+
 def category_icons_directory_path(instance: "Category", filename: str) -> str:
     return "categories/category_{pk}/icon/{filename}".format(
         pk=instance.pk, filename=filename
@@ -35,8 +84,11 @@ class Category(models.Model):
         default=0, verbose_name="индекс сортировки"
     )
     active = models.BooleanField(default=False, verbose_name="статус активности")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="изменено")
     tags = TaggableManager()
 
+    objects = CategoryQuerySet.as_manager()
+
     def __str__(self):
         return f'Category(pk="{self.pk}", title="{self.title}")'
 
@@ -45,15 +97,6 @@ class Category(models.Model):
         if self.image and hasattr(self.image, "url"):
             return self.image.url
 
-    def change_status(self):
-        item = Item.objects.filter(category_id=self.pk, is_published=True)
-        if item:
-            self.active = True
-            self.save()
-        else:
-            self.active = False
-            self.save()
-
 
 def subcategory_icons_directory_path(instance: "SubCategory", filename: str) -> str:
     return "subcategories/category_{pk}/icon/{filename}".format(
@@ -78,6 +121,9 @@ class SubCategory(models.Model):
         default=0, verbose_name="индекс сортировки"
     )
     active = models.BooleanField(default=False, verbose_name="статус активности")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="изменено")
+
+    objects = SubCategoryQuerySet.as_manager()
 
     def __str__(self):
         return (
@@ -89,14 +135,140 @@ class SubCategory(models.Model):
         if self.image and hasattr(self.image, "url"):
             return self.image.url
 
-    def change_status(self):
-        item = Item.objects.filter(category_id=self.pk)
-        if item:
-            self.active = True
-            self.save()
-        else:
-            self.active = False
-            self.save()
+
+POPULARITY_RATING_WEIGHT = 2
+
+
+def discounted_price():
+    """
+    Цена со скидкой, округленная до копеек половиной вверх, как в Item.final_price.
+    Считается в целых копейках, чтобы не зависеть от округления float в БД
+    """
+
+    cents = Cast(Round(F("price") * 100), models.IntegerField())
+    return Cast(
+        (cents * (100 - F("discount")) + 50) / 100, models.IntegerField()
+    ) * Decimal("0.01")
+
+
+class ItemQuerySet(models.QuerySet):
+    def update_changed(self, **values) -> int:
+        """
+        Обновляет только товары, у которых значения изменятся,
+        и проставляет им время изменения
+        """
+
+        return (
+            self.alias(**{f"new_{field}": value for field, value in values.items()})
+            .exclude(**{field: F(f"new_{field}") for field in values})
+            .update(**values, updated_at=timezone.now())
+        )
+
+    def rebuild_ratings(self) -> int:
+        reviews = Review.objects.filter(item_id=OuterRef("pk")).values("item_id")
+        review_count = Coalesce(
+            Subquery(reviews.annotate(count=Count("pk")).values("count")), 0
+        )
+        rating_sum = Coalesce(
+            Subquery(reviews.annotate(total=Sum("rate")).values("total")), 0
+        )
+        return self.update_changed(
+            review_count=review_count,
+            rating_sum=rating_sum,
+            rating_avg=Case(
+                When(Exact(review_count, 0), then=0.0),
+                default=Cast(rating_sum, FloatField()) / review_count,
+                output_field=FloatField(),
+            ),
+        )
+
+    def increment(self, field: str, counts: dict) -> int:
+        """Увеличивает поле field товаров, counts - словарь id товара: кол-во"""
+
+        if not counts:
+            return 0
+        return self.filter(id__in=counts).update(
+            **{
+                field: F(field)
+                + Case(
+                    *[
+                        When(id=item_id, then=count)
+                        for item_id, count in counts.items()
+                    ],
+                    default=0,
+                )
+            },
+            updated_at=timezone.now(),
+        )
+
+    def refresh_effective_prices(self, date: datetime.date = None) -> int:
+        """Пересчитывает итоговую цену с учетом скидки и действующих распродаж"""
+
+        sale_price = (
+            Sales.objects.active(date)
+            .filter(item_id=OuterRef("pk"))
+            .values("item_id")
+            .annotate(price=Min("salePrice"))
+            .values("price")
+        )
+        return self.update_changed(
+            effective_price=Coalesce(
+                Subquery(sale_price),
+                discounted_price(),
+                output_field=models.DecimalField(max_digits=8, decimal_places=2),
+            )
+        )
+
+    def refresh_popularity(self, since: datetime.datetime) -> int:
+        """Пересчитывает популярность по продажам с даты since и рейтингу"""
+
+        sold = (
+            OrderItem.objects.filter(
+                item_id=OuterRef("pk"),
+                order__status="accepted",
+                order__created_at__gte=since,
+            )
+            .values("item_id")
+            .annotate(total=Sum("count"))
+            .values("total")
+        )
+        return self.update_changed(
+            popularity=Cast(Coalesce(Subquery(sold), 0), FloatField())
+            + F("rating_avg") * POPULARITY_RATING_WEIGHT
+        )
+
+    def refresh_tags(self) -> int:
+        """Пересобирает индекс тэгов товаров по тэгам их категорий"""
+
+        items = list(self.values_list("id", "category_id"))
+        category_tags = {}
+        for category_id, tag_id in TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Category),
+            object_id__in={category_id for _, category_id in items},
+        ).values_list("object_id", "tag_id"):
+            category_tags.setdefault(category_id, []).append(tag_id)
+        with transaction.atomic():
+            ItemTag.objects.filter(item__in=self).delete()
+            return len(
+                ItemTag.objects.bulk_create(
+                    [
+                        ItemTag(item_id=item_id, tag_id=tag_id)
+                        for item_id, category_id in items
+                        for tag_id in category_tags.get(category_id, [])
+                    ],
+                    batch_size=1000,
+                )
+            )
+
+    def with_tags(self, tag_ids: list, match_all: bool = False) -> "ItemQuerySet":
+        """Товары с любым из тэгов tag_ids или, при match_all, со всеми сразу"""
+
+        item_tags = ItemTag.objects.filter(tag_id__in=tag_ids).values("item_id")
+        if match_all:
+            item_tags = item_tags.annotate(matched=Count("tag_id")).filter(
+                matched=len(set(tag_ids))
+            )
+        return self.filter(id__in=item_tags.values("item_id"))
 
 
 def item_preview_directory_path(instance: "Item", filename: str) -> str:
@@ -108,6 +280,58 @@ def item_preview_directory_path(instance: "Item", filename: str) -> str:
 class Item(models.Model):
     class Meta:
         ordering = ["name", "price"]
+        indexes = [
+            models.Index(
+                fields=["effective_price"],
+                condition=Q(is_published=True),
+                name="item_price_idx",
+            ),
+            models.Index(
+                fields=["effective_price"],
+                condition=Q(is_published=True, free_delivery=True),
+                name="item_delivery_price_idx",
+            ),
+            models.Index(
+                fields=["category", "effective_price"],
+                condition=Q(is_published=True),
+                name="item_category_price_idx",
+            ),
+            models.Index(
+                fields=["subcategory", "effective_price"],
+                condition=Q(is_published=True),
+                name="item_subcategory_price_idx",
+            ),
+            models.Index(
+                fields=["created_at"],
+                condition=Q(is_published=True),
+                name="item_created_idx",
+            ),
+            models.Index(
+                fields=["sort_index", "id"],
+                condition=Q(is_published=True, banner=True),
+                name="item_banner_idx",
+            ),
+            models.Index(
+                fields=["name", "price"],
+                condition=Q(is_published=True, limited=True),
+                name="item_limited_idx",
+            ),
+            models.Index(
+                fields=["review_count", "id"],
+                condition=Q(is_published=True),
+                name="item_reviews_idx",
+            ),
+            models.Index(
+                fields=["rating_avg", "id"],
+                condition=Q(is_published=True),
+                name="item_rating_idx",
+            ),
+            models.Index(
+                fields=["popularity", "id"],
+                condition=Q(is_published=True),
+                name="item_popularity_idx",
+            ),
+        ]
         verbose_name = "товар"
         verbose_name_plural = "товар"
 
@@ -125,8 +349,18 @@ class Item(models.Model):
     price = models.DecimalField(
         default=0, max_digits=8, decimal_places=2, verbose_name="цена"
     )
+    effective_price = models.DecimalField(
+        default=0,
+        max_digits=8,
+        decimal_places=2,
+        editable=False,
+        verbose_name="итоговая цена",
+    )
     quantity = models.PositiveIntegerField(default=0, verbose_name="кол-во")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="создано")
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="изменено"
+    )
     is_published = models.BooleanField(default=False, verbose_name="публикация")
     sold = models.PositiveIntegerField(default=0, verbose_name="продано")
     market = models.ForeignKey(
@@ -147,27 +381,85 @@ class Item(models.Model):
     reviews = models.PositiveIntegerField(default=0, verbose_name="отзывов")
     discount = models.PositiveIntegerField(default=0, null=False, verbose_name="скидка")
     limited = models.BooleanField(default=False, verbose_name="ограниченный тираж")
+    banner = models.BooleanField(default=False, verbose_name="показывать в баннерах")
+    review_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="кол-во отзывов"
+    )
+    rating_sum = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="сумма оценок"
+    )
+    rating_avg = models.FloatField(
+        default=0, editable=False, verbose_name="средняя оценка"
+    )
+    popularity = models.FloatField(
+        default=0, editable=False, verbose_name="популярность"
+    )
+
+    objects = ItemQuerySet.as_manager()
 
     def __str__(self):
         return f'Item(pk="{self.pk}", name="{self.name}")'
 
     def final_price(self):
-        return round(self.price * (100 - self.discount) / 100, 2)
+        return (Decimal(self.price) * (100 - int(self.discount)) / 100).quantize(
+            Decimal("0.01"), ROUND_HALF_UP
+        )
 
     def count_reviews(self):
-        reviews = [review for review in Review.objects.filter(item_id=self.pk)]
-        return len(reviews)
+        return self.review_count
 
     def get_rating(self):
-        ratings = [review.rate for review in Review.objects.filter(item_id=self.pk)]
-        if sum(ratings) != 0:
-            result = sum(ratings) / len(ratings)
-            return result
-        return 0
+        return self.rating_avg
+
+    @classmethod
+    def change_rating(cls, item_id: int, rate: int, count: int) -> None:
+        """Инкрементально обновляет агрегаты отзывов товара"""
+
+        cls.objects.filter(pk=item_id).update(
+            rating_sum=F("rating_sum") + rate,
+            review_count=F("review_count") + count,
+            rating_avg=Case(
+                When(review_count=-count, then=0.0),
+                default=Cast(F("rating_sum") + rate, FloatField())
+                / (F("review_count") + count),
+                output_field=FloatField(),
+            ),
+            updated_at=timezone.now(),
+        )
+
+
+class ItemTag(models.Model):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tag", "item"], name="item_tag_unique")
+        ]
+        verbose_name = "тэг товара"
+        verbose_name_plural = "тэги товаров"
+
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, related_name="item_tags", verbose_name="товар"
+    )
+    tag = models.ForeignKey(
+        Tag, on_delete=models.CASCADE, db_index=False, verbose_name="тэг"
+    )
+
+
+class SalesQuerySet(models.QuerySet):
+    def active(self, date: datetime.date = None) -> "SalesQuerySet":
+        """Скидки, действующие на дату date (по умолчанию сегодня)"""
+
+        date = date or timezone.localdate()
+        return self.filter(dateFrom__lte=date, dateTo__gte=date)
 
 
 class Sales(models.Model):
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["item", "dateFrom", "dateTo"], name="sales_item_dates_idx"
+            ),
+            models.Index(fields=["dateTo", "dateFrom"], name="sales_dates_idx"),
+        ]
         verbose_name = "скидка"
         verbose_name_plural = "скидки"
 
@@ -177,6 +469,11 @@ class Sales(models.Model):
     )
     dateFrom = models.DateField(verbose_name="дата старта")
     dateTo = models.DateField(verbose_name="дата окончания")
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name="изменено"
+    )
+
+    objects = SalesQuerySet.as_manager()
 
 
 def item_image_directory_path(instance: "ItemImage", filename: str) -> str:
@@ -209,6 +506,7 @@ class Review(models.Model):
     )
 
     class Meta:
+        indexes = [models.Index(fields=["item", "rate"], name="review_item_rate_idx")]
         verbose_name = "отзыв"
         verbose_name_plural = "отзывы"
 
@@ -226,8 +524,16 @@ class Specifications(models.Model):
     value = models.CharField(max_length=100, verbose_name="значение")
 
 
+def order_expiration() -> datetime.datetime:
+    return timezone.now() + datetime.timedelta(minutes=settings.ORDER_EXPIRE_MINUTES)
+
+
 class Order(models.Model):
     class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+            models.Index(fields=["status", "expires_at"], name="order_expires_idx"),
+        ]
         verbose_name = "заказ"
         verbose_name_plural = "заказы"
 
@@ -242,7 +548,7 @@ class Order(models.Model):
     address = models.CharField(null=True, max_length=200, verbose_name="адрес")
     paymentType = models.CharField(max_length=50, null=True, verbose_name="тип оплаты")
     totalCost = models.DecimalField(
-        max_digits=8, decimal_places=2, verbose_name="полная стоимость"
+        max_digits=12, decimal_places=2, verbose_name="полная стоимость"
     )
     status = models.CharField(
         default="not_accepted", max_length=50, verbose_name="статус заказа"
@@ -250,6 +556,74 @@ class Order(models.Model):
     deliveryType = models.CharField(
         default="ordinary", max_length=20, verbose_name="тип доставки"
     )
+    reserved = models.BooleanField(default=False, verbose_name="товар зарезервирован")
+    expires_at = models.DateTimeField(
+        null=True, default=order_expiration, verbose_name="истекает"
+    )
+
+    UNPAID_STATUSES = ("not_accepted", "payment")
+
+    def get_counts(self) -> dict:
+        """Кол-во товара в заказе в виде словаря id товара: кол-во"""
+
+        counts = {}
+        for item_id, count in self.orderitem_set.values_list("item_id", "count"):
+            counts[item_id] = counts.get(item_id, 0) + count
+        return counts
+
+    def reserve_stock(self) -> bool:
+        """Списывает товар заказа со склада, False если товара не хватает"""
+
+        with transaction.atomic():
+            if not Order.objects.filter(pk=self.pk, reserved=False).update(
+                reserved=True
+            ):
+                return True
+            for item_id, count in sorted(self.get_counts().items()):
+                if not Item.objects.filter(id=item_id, quantity__gte=count).update(
+                    quantity=F("quantity") - count, updated_at=timezone.now()
+                ):
+                    transaction.set_rollback(True)
+                    return False
+        self.reserved = True
+        return True
+
+    @classmethod
+    def expire(cls, batch_size: int) -> int:
+        """Удаляет пачку неоплаченных заказов с истекшим сроком"""
+
+        with transaction.atomic():
+            ids = list(
+                cls.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status__in=cls.UNPAID_STATUSES,
+                    expires_at__lt=timezone.now(),
+                )
+                .values_list("id", flat=True)[:batch_size]
+            )
+            counts = {}
+            for item_id, count in OrderItem.objects.filter(
+                order_id__in=ids, order__reserved=True
+            ).values_list("item_id", "count"):
+                counts[item_id] = counts.get(item_id, 0) + count
+            cls.objects.filter(id__in=ids).update(reserved=False)
+            Item.objects.increment("quantity", counts)
+            cls.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+    def commit_stock(self) -> None:
+        """Закрывает резерв оплаченного заказа, товар остается списанным"""
+
+        Order.objects.filter(pk=self.pk, reserved=True).update(reserved=False)
+        self.reserved = False
+
+    def release_stock(self) -> None:
+        """Возвращает зарезервированный товар заказа на склад"""
+
+        with transaction.atomic():
+            if Order.objects.filter(pk=self.pk, reserved=True).update(reserved=False):
+                Item.objects.increment("quantity", self.get_counts())
+        self.reserved = False
 
 
 class OrderItem(models.Model):
@@ -265,6 +639,9 @@ class OrderItem(models.Model):
     )
     count = models.PositiveIntegerField(verbose_name="кол-во")
     order = models.ForeignKey(Order, on_delete=models.CASCADE, verbose_name="заказ")
+    snapshot = models.JSONField(
+        default=dict, editable=False, verbose_name="снимок товара"
+    )
 
 
 class Payment(models.Model):
@@ -279,6 +656,6 @@ class Payment(models.Model):
     number = models.CharField(max_length=100, verbose_name="номер карты")
     name = models.CharField(max_length=100, verbose_name="имя владельца карты")
     payment = models.DecimalField(
-        max_digits=8, decimal_places=2, verbose_name="сумма платежа"
+        max_digits=12, decimal_places=2, verbose_name="сумма платежа"
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="создано")
@@ -0,0 +1,51 @@
+import base64
+import binascii
+import json
+from typing import Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework import exceptions
+
+
+class KeysetPaginator:
+    """Постраничный вывод по ключу сортировки и id вместо OFFSET и COUNT"""
+
+    def __init__(self, queryset: QuerySet, per_page: int, field: str, descending: bool):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+        self.descending = descending
+
+    def get_page(self, cursor: Optional[str]) -> tuple:
+        prefix = "-" if self.descending else ""
+        queryset = self.queryset.order_by(prefix + self.field, prefix + "id")
+        if cursor:
+            value, pk = self.decode(cursor)
+            lookup = "lt" if self.descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{lookup}": value})
+                | Q(**{self.field: value, f"id__{lookup}": pk})
+            )
+
+        objects = list(queryset[: self.per_page + 1])
+        if len(objects) <= self.per_page:
+            return objects, None
+        objects = objects[: self.per_page]
+        return objects, self.encode(objects[-1])
+
+    def encode(self, obj) -> str:
+        key = [str(getattr(obj, self.field)), obj.pk]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def decode(self, cursor: str) -> tuple:
+        annotation = self.queryset.query.annotations.get(self.field)
+        if annotation is not None:
+            field = annotation.output_field
+        else:
+            field = self.queryset.model._meta.get_field(self.field)
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return field.to_python(value), int(pk)
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise exceptions.ValidationError({"cursor": "Неверный курсор"})
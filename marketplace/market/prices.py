@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from . import cache
+from .models import Sales
+
+SALES_CACHE_KEY = "active_sales"
+
+
+def build_sale_prices() -> dict:
+    sales = (
+        Sales.objects.active()
+        .values("item_id")
+        .annotate(price=Min("salePrice"))
+        .values_list("item_id", "price")
+    )
+    return {item_id: price.quantize(Decimal("0.01")) for item_id, price in sales}
+
+
+def get_sale_prices() -> dict:
+    """Действующие сегодня скидочные цены, словарь id товара: цена"""
+
+    return cache.get_or_build(
+        SALES_CACHE_KEY,
+        build_sale_prices,
+        settings.SALES_CACHE_TIMEOUT,
+        key=f"{SALES_CACHE_KEY}:{timezone.localdate()}",
+    )
+
+
+def get_effective_price(item) -> Decimal:
+    """Итоговая цена товара: скидочная, если действует распродажа, иначе со скидкой"""
+
+    return get_sale_prices().get(item.id, item.final_price())
+
+
+def get_price(item) -> Decimal:
+    return item.effective_price
@@ -0,0 +1,204 @@
+import re
+from typing import Iterable
+
+from django.db import connection
+from django.db.models import FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+
+from .models import Item, Specifications
+
+SEARCH_TABLE = "market_item_search"
+
+
+class SearchBackend:
+    """Поиск по вхождению подстроки, без отдельного индекса"""
+
+    rank_descending = False
+
+    def setup(self, cursor) -> None:
+        pass
+
+    def clear(self, cursor) -> None:
+        pass
+
+    def update(self, cursor, documents: list) -> None:
+        pass
+
+    def delete(self, cursor, item_ids: list) -> None:
+        pass
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        return queryset.filter(name__icontains=query)
+
+
+class SqliteSearchBackend(SearchBackend):
+    """Поиск через виртуальную таблицу SQLite FTS5"""
+
+    def setup(self, cursor) -> None:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "name, description, specifications, tokenize='unicode61')"
+        )
+
+    def clear(self, cursor) -> None:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    def update(self, cursor, documents: list) -> None:
+        self.delete(cursor, [document[0] for document in documents])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, description, specifications) "
+            "VALUES (%s, %s, %s, %s)",
+            documents,
+        )
+
+    def delete(self, cursor, item_ids: list) -> None:
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+            [(item_id,) for item_id in item_ids],
+        )
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        terms = get_terms(query)
+        if not terms:
+            return super().search(queryset, query)
+        match = " ".join(f'"{term}"*' for term in terms)
+        # Таблица FTS присоединяется один раз, ранг берется из того же MATCH
+        return (
+            queryset.extra(
+                tables=[SEARCH_TABLE],
+                where=[
+                    f"{SEARCH_TABLE}.rowid = {Item._meta.db_table}.id",
+                    f"{SEARCH_TABLE} MATCH %s",
+                ],
+                params=[match],
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f"bm25({SEARCH_TABLE}, 10.0, 3.0, 1.0)", [], FloatField()
+                )
+            )
+            .order_by("search_rank")
+        )
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Поиск через tsvector с GIN индексом PostgreSQL"""
+
+    rank_descending = True
+
+    def setup(self, cursor) -> None:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+            f"item_id bigint PRIMARY KEY REFERENCES {Item._meta.db_table} (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx "
+            f"ON {SEARCH_TABLE} USING GIN (document)"
+        )
+
+    def clear(self, cursor) -> None:
+        cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+
+    def update(self, cursor, documents: list) -> None:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (item_id, document) VALUES (%s, "
+            "setweight(to_tsvector('simple', %s), 'A') || "
+            "setweight(to_tsvector('simple', %s), 'B') || "
+            "setweight(to_tsvector('simple', %s), 'C')) "
+            "ON CONFLICT (item_id) DO UPDATE SET document = EXCLUDED.document",
+            documents,
+        )
+
+    def delete(self, cursor, item_ids: list) -> None:
+        cursor.execute(
+            f"DELETE FROM {SEARCH_TABLE} WHERE item_id = ANY(%s)", [list(item_ids)]
+        )
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        terms = get_terms(query)
+        if not terms:
+            return super().search(queryset, query)
+        match = " & ".join(f"{term}:*" for term in terms)
+        return (
+            queryset.filter(
+                id__in=RawSQL(
+                    f"SELECT item_id FROM {SEARCH_TABLE} "
+                    "WHERE document @@ to_tsquery('simple', %s)",
+                    [match],
+                )
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f"SELECT ts_rank(document, to_tsquery('simple', %s)) "
+                    f"FROM {SEARCH_TABLE} "
+                    f"WHERE item_id = {Item._meta.db_table}.id",
+                    [match],
+                    FloatField(),
+                )
+            )
+            .order_by("-search_rank")
+        )
+
+
+BACKENDS = {
+    "sqlite": SqliteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+_backend = None
+
+
+def get_backend() -> SearchBackend:
+    global _backend
+    if _backend is None:
+        _backend = BACKENDS.get(connection.vendor, SearchBackend)()
+        with connection.cursor() as cursor:
+            _backend.setup(cursor)
+    return _backend
+
+
+def get_terms(query: str) -> list:
+    return re.findall(r"\w+", query.lower())
+
+
+def get_documents(item_ids: Iterable[int]) -> list:
+    specifications = {}
+    for item_id, value in Specifications.objects.filter(
+        item_id__in=item_ids
+    ).values_list("item_id", "value"):
+        specifications.setdefault(item_id, []).append(value)
+
+    return [
+        (item_id, name, description, " ".join(specifications.get(item_id, [])))
+        for item_id, name, description in Item.objects.filter(
+            id__in=item_ids
+        ).values_list("id", "name", "description")
+    ]
+
+
+def index_items(item_ids: Iterable[int]) -> None:
+    """Обновляет поисковый индекс для переданных товаров"""
+
+    item_ids = list(item_ids)
+    with connection.cursor() as cursor:
+        get_backend().update(cursor, get_documents(item_ids))
+
+
+def remove_items(item_ids: Iterable[int]) -> None:
+    with connection.cursor() as cursor:
+        get_backend().delete(cursor, list(item_ids))
+
+
+def rebuild_index(batch_size: int = 1000) -> int:
+    """Полностью перестраивает поисковый индекс каталога"""
+
+    backend = get_backend()
+    item_ids = list(Item.objects.order_by("id").values_list("id", flat=True))
+    with connection.cursor() as cursor:
+        backend.clear(cursor)
+        for start in range(0, len(item_ids), batch_size):
+            backend.update(cursor, get_documents(item_ids[start : start + batch_size]))
+    return len(item_ids)
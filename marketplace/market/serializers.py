@@ -1,11 +1,23 @@
+from django.db.models import Manager, prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.pagination import LimitOffsetPagination
 
 from .models import *
-from taggit.models import Tag
+from .prices import get_price
+from .tags import get_category_tags
+
+
+class PrefetchListSerializer(serializers.ListSerializer):
+    """Подгружает связанные данные всей страницы пакетно, по запросу на связь"""
+
+    def to_representation(self, data):
+        objects = list(data.all() if isinstance(data, Manager) else data)
+        prefetch_related_objects(objects, *self.child.Meta.prefetch_related)
+        return super().to_representation(objects)
 
 
 class CatalogSerializer(serializers.ModelSerializer):
+    price = serializers.SerializerMethodField()
     date = serializers.SerializerMethodField()
     title = serializers.SerializerMethodField()
     freeDelivery = serializers.SerializerMethodField()
@@ -29,6 +41,11 @@ class CatalogSerializer(serializers.ModelSerializer):
             "reviews",
             "rating",
         ]
+        list_serializer_class = PrefetchListSerializer
+        prefetch_related = ["images"]
+
+    def get_price(self, obj):
+        return str(get_price(obj))
 
     def get_date(self, obj):
         return obj.created_at.strftime(
@@ -44,17 +61,14 @@ class CatalogSerializer(serializers.ModelSerializer):
     def get_images(self, obj):
         result = [
             {"src": image.image_url, "alt": "Image alt string"}
-            for image in ItemImage.objects.filter(item_id=obj.id)
+            for image in obj.images.all()
         ]
         if result:
             return result
         return [{"src": "", "alt": "Image alt string"}]
 
     def get_tags(self, obj):
-        return [
-            {"id": tag.id, "name": tag.name}
-            for tag in Tag.objects.filter(category=obj.category_id)
-        ]
+        return get_category_tags(obj.category_id)
 
     def get_reviews(self, obj):
         return obj.count_reviews()
@@ -64,6 +78,7 @@ class CatalogSerializer(serializers.ModelSerializer):
 
 
 class ItemDetailsSerializer(serializers.ModelSerializer):
+    price = serializers.SerializerMethodField()
     date = serializers.SerializerMethodField()
     title = serializers.SerializerMethodField()
     freeDelivery = serializers.SerializerMethodField()
@@ -90,6 +105,9 @@ class ItemDetailsSerializer(serializers.ModelSerializer):
             "rating",
         ]
 
+    def get_price(self, obj):
+        return str(get_price(obj))
+
     def get_date(self, obj):
         return obj.created_at.strftime(
             "%a %b %d %Y %X %Z%z (Coordinated Universal Time)"
@@ -111,10 +129,7 @@ class ItemDetailsSerializer(serializers.ModelSerializer):
         return [{"src": "", "alt": "Image alt string"}]
 
     def get_tags(self, obj):
-        return [
-            {"id": tag.id, "name": tag.name}
-            for tag in Tag.objects.filter(category=obj.category_id)
-        ]
+        return get_category_tags(obj.category_id)
 
     def get_reviews(self, obj):
         result = [
@@ -175,48 +190,48 @@ class OrderItemDetailsSerializer(serializers.ModelSerializer):
         ]
 
     def get_id(self, obj):
-        return obj.item.id
+        return obj.item_id
 
     def get_category(self, obj):
-        return obj.item.category_id
+        return obj.snapshot.get("category")
 
     def get_price(self, obj):
         return obj.price * obj.count
 
     def get_date(self, obj):
-        return obj.item.created_at.strftime(
-            "%a %b %d %Y %X %Z%z (Coordinated Universal Time)"
-        )
+        return obj.snapshot.get("date")
 
     def get_title(self, obj):
-        return obj.item.name
+        return obj.snapshot.get("title")
 
     def get_description(self, obj):
-        return obj.item.description
+        return obj.snapshot.get("description")
 
     def get_freeDelivery(self, obj):
-        return obj.item.free_delivery
+        return obj.snapshot.get("freeDelivery")
 
     def get_images(self, obj):
-        result = [
-            {"src": image.image_url, "alt": "Image alt string"}
-            for image in ItemImage.objects.filter(item_id=obj.item_id)
-        ]
-        if result:
-            return result
-        return [{"src": "", "alt": "Image alt string"}]
+        return obj.snapshot.get("images", [{"src": "", "alt": "Image alt string"}])
 
     def get_tags(self, obj):
-        return [
-            {"id": tag.id, "name": tag.name}
-            for tag in Tag.objects.filter(category=obj.item.category_id)
-        ]
+        return obj.snapshot.get("tags", [])
 
     def get_reviews(self, obj):
-        return obj.item.count_reviews()
+        return obj.snapshot.get("reviews")
 
     def get_rating(self, obj):
-        return obj.item.get_rating()
+        return obj.snapshot.get("rating")
+
+
+def build_snapshots(items) -> dict:
+    """Снимки товаров для позиций заказа, словарь id товара: снимок"""
+
+    snapshots = {}
+    for data in CatalogSerializer(items, many=True).data:
+        snapshot = dict(data)
+        del snapshot["price"]
+        snapshots[snapshot["id"]] = snapshot
+    return snapshots
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -242,6 +257,11 @@ class OrderSerializer(serializers.ModelSerializer):
             "address",
             "products",
         ]
+        list_serializer_class = PrefetchListSerializer
+        prefetch_related = [
+            "user__profile",
+            "orderitem_set",
+        ]
 
     def get_fullName(self, obj):
         return obj.user.profile.fullName
@@ -256,8 +276,7 @@ class OrderSerializer(serializers.ModelSerializer):
         return obj.user.profile.phone
 
     def get_products(self, obj):
-        order_items = OrderItem.objects.select_related("item").filter(order_id=obj.id)
-        serializer = OrderItemDetailsSerializer(order_items, many=True)
+        serializer = OrderItemDetailsSerializer(obj.orderitem_set.all(), many=True)
         return serializer.data
 
 
@@ -280,6 +299,8 @@ class SalesSerializer(serializers.ModelSerializer):
             "images",
             "tags",
         ]
+        list_serializer_class = PrefetchListSerializer
+        prefetch_related = ["item__images"]
 
     def get_id(self, obj):
         return obj.item_id
@@ -293,14 +314,11 @@ class SalesSerializer(serializers.ModelSerializer):
     def get_images(self, obj):
         result = [
             {"src": image.image_url, "alt": "Image alt string"}
-            for image in ItemImage.objects.filter(item_id=obj.item.id)
+            for image in obj.item.images.all()
         ]
         if result:
             return result
         return [{"src": "", "alt": "Image alt string"}]
 
     def get_tags(self, obj):
-        return [
-            {"id": tag.id, "name": tag.name}
-            for tag in Tag.objects.filter(category=obj.item.category_id)
-        ]
+        return get_category_tags(obj.item.category_id)
@@ -0,0 +1,176 @@
+from django.db import connection
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from . import cache, prices, search, tags
+from .banners import BANNERS_CACHE_KEY
+from .menu import MENU_CACHE_KEY, refresh_active
+from .models import (
+    Category,
+    Item,
+    ItemImage,
+    Order,
+    Review,
+    Sales,
+    Specifications,
+    SubCategory,
+)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rate(sender, instance: Review, **kwargs) -> None:
+    instance._previous = (
+        Review.objects.filter(pk=instance.pk).values_list("item_id", "rate").first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Review)
+def add_review_rate(sender, instance: Review, created: bool, **kwargs) -> None:
+    previous = getattr(instance, "_previous", None)
+    if previous and previous[0] == instance.item_id:
+        Item.change_rating(instance.item_id, instance.rate - previous[1], 0)
+        return
+    if previous:
+        Item.change_rating(previous[0], -previous[1], -1)
+    Item.change_rating(instance.item_id, instance.rate, 1)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rate(sender, instance: Review, **kwargs) -> None:
+    Item.change_rating(instance.item_id, -instance.rate, -1)
+
+
+@receiver(pre_save, sender=Item)
+def remember_item_categories(sender, instance: Item, **kwargs) -> None:
+    instance._previous_categories = (
+        Item.objects.filter(pk=instance.pk)
+        .values_list("category_id", "subcategory_id", "is_published")
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def refresh_item_categories(sender, instance: Item, **kwargs) -> None:
+    current = (instance.category_id, instance.subcategory_id, instance.is_published)
+    previous = (
+        None
+        if kwargs["signal"] is post_delete
+        else getattr(instance, "_previous_categories", None)
+    )
+    if previous == current or (previous is None and not instance.is_published):
+        return
+    category_ids = [instance.category_id]
+    subcategory_ids = [instance.subcategory_id]
+    if previous:
+        category_ids.append(previous[0])
+        subcategory_ids.append(previous[1])
+    refresh_active(category_ids, subcategory_ids)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def invalidate_menu(sender, **kwargs) -> None:
+    cache.invalidate(MENU_CACHE_KEY)
+
+
+@receiver(post_save, sender=Item)
+def index_item(sender, instance: Item, **kwargs) -> None:
+    search.index_items([instance.pk])
+
+
+@receiver(post_delete, sender=Item)
+def remove_item_from_index(sender, instance: Item, **kwargs) -> None:
+    search.remove_items([instance.pk])
+
+
+@receiver(post_save, sender=Specifications)
+@receiver(post_delete, sender=Specifications)
+def index_item_specifications(sender, instance: Specifications, **kwargs) -> None:
+    search.index_items([instance.item_id])
+
+
+@receiver(post_migrate)
+def setup_search(sender, **kwargs) -> None:
+    if sender.name == "market":
+        with connection.cursor() as cursor:
+            search.get_backend().setup(cursor)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_banners(sender, **kwargs) -> None:
+    cache.invalidate(BANNERS_CACHE_KEY)
+
+
+@receiver(pre_delete, sender=Order)
+def release_order_stock(sender, instance: Order, **kwargs) -> None:
+    if instance.reserved:
+        instance.release_stock()
+
+
+@receiver(post_save, sender=Sales)
+@receiver(post_delete, sender=Sales)
+def refresh_sale_prices(sender, instance: Sales, **kwargs) -> None:
+    cache.invalidate(prices.SALES_CACHE_KEY)
+    Item.objects.filter(id=instance.item_id).refresh_effective_prices()
+
+
+@receiver(pre_save, sender=Item)
+def set_effective_price(sender, instance: Item, **kwargs) -> None:
+    instance.effective_price = prices.get_effective_price(instance)
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs) -> None:
+    tags.invalidate()
+
+
+@receiver(post_save, sender=Item)
+def refresh_item_tags(sender, instance: Item, created: bool, **kwargs) -> None:
+    previous = getattr(instance, "_previous_categories", None)
+    if created or not previous or previous[0] != instance.category_id:
+        Item.objects.filter(pk=instance.pk).refresh_tags()
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def refresh_category_item_tags(sender, instance, action: str, **kwargs) -> None:
+    if isinstance(instance, Category) and action.startswith("post_"):
+        Item.objects.filter(category_id=instance.pk).refresh_tags()
+
+
+@receiver(post_save, sender=Specifications)
+@receiver(post_delete, sender=Specifications)
+@receiver(post_save, sender=ItemImage)
+@receiver(post_delete, sender=ItemImage)
+def touch_item(sender, instance, **kwargs) -> None:
+    Item.objects.filter(pk=instance.item_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Item)
+def touch_item_category(sender, instance: Item, **kwargs) -> None:
+    Category.objects.filter(pk=instance.category_id).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def touch_tagged_category(sender, instance, action: str, **kwargs) -> None:
+    if isinstance(instance, Category) and action.startswith("post_"):
+        Category.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
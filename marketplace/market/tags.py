@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from taggit.models import Tag, TaggedItem
+
+from . import cache
+from .models import Category
+
+TAGS_CACHE_KEY = "category_tags"
+
+_local = {"version": None, "checked_at": 0.0, "tags": None}
+
+
+def build_tags() -> dict:
+    """Все тэги и тэги категорий, словарь id категории: список тэгов"""
+
+    categories = {}
+    tagged_items = (
+        TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Category)
+        )
+        .select_related("tag")
+        .order_by("id")
+    )
+    for tagged_item in tagged_items:
+        categories.setdefault(tagged_item.object_id, []).append(
+            {"id": tagged_item.tag.id, "name": tagged_item.tag.name}
+        )
+    return {
+        "all": [{"id": tag.id, "name": tag.name} for tag in Tag.objects.all()],
+        "categories": categories,
+    }
+
+
+def get_tags() -> dict:
+    """
+    Возвращает тэги из памяти процесса, сверяя версию с общим кешем
+    не чаще раза в TAGS_LOCAL_TIMEOUT секунд
+    """
+
+    now = time.monotonic()
+    if _local["tags"] is None or now - _local["checked_at"] >= (
+        settings.TAGS_LOCAL_TIMEOUT
+    ):
+        version = cache.get_version(TAGS_CACHE_KEY)
+        if version != _local["version"] or _local["tags"] is None:
+            _local["tags"] = cache.get_or_build(
+                TAGS_CACHE_KEY, build_tags, settings.TAGS_CACHE_TIMEOUT
+            )
+            _local["version"] = version
+        _local["checked_at"] = now
+    return _local["tags"]
+
+
+def get_category_tags(category_id: int) -> list:
+    return get_tags()["categories"].get(category_id, [])
+
+
+def invalidate() -> None:
+    cache.invalidate(TAGS_CACHE_KEY)
+    _local["tags"] = None
@@ -1,3 +1,155 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .management.commands._bench import reserve_concurrently
+from .models import Category, Item, ItemImage, Market, Order, OrderItem, Payment
+from .serializers import CatalogSerializer
+
+
+class CatalogSerializerQueriesTest(TestCase):
+    """Кол-во запросов сериализации страницы каталога не зависит от ее размера"""
+
+    @classmethod
+    def setUpTestData(cls):
+        market = Market.objects.create(title="Магазин")
+        category = Category.objects.create(title="Категория")
+        category.tags.add("тэг")
+        for number in range(12):
+            item = Item.objects.create(
+                name=f"Товар {number}",
+                market=market,
+                category=category,
+                price=10,
+                is_published=True,
+            )
+            ItemImage.objects.create(item=item, image=f"items/{number}.png")
+
+    def serialize_page(self, size: int) -> list:
+        return CatalogSerializer(Item.objects.all()[:size], many=True).data
+
+    def test_constant_queries(self):
+        self.serialize_page(1)
+        for size in (2, 6, 12):
+            with self.subTest(size=size), self.assertNumQueries(2):
+                self.assertEqual(len(self.serialize_page(size)), size)
+
+
+class ReserveStockConcurrencyTest(TransactionTestCase):
+    """Конкурентные заказы не резервируют товар сверх остатка"""
+
+    stock = 20
+    orders = 60
+    threads = 6
+
+    def setUp(self):
+        market = Market.objects.create(title="Магазин")
+        category = Category.objects.create(title="Категория")
+        self.item = Item.objects.create(
+            name="Товар",
+            market=market,
+            category=category,
+            quantity=self.stock,
+            is_published=True,
+        )
+        user = User.objects.create_user("buyer")
+        self.order_list = []
+        for _ in range(self.orders):
+            order = Order.objects.create(user=user, totalCost=self.item.price)
+            OrderItem.objects.create(
+                item=self.item, price=self.item.price, count=1, order=order
+            )
+            self.order_list.append(order)
+
+    def test_no_oversell(self):
+        results = reserve_concurrently(self.order_list, self.threads)
+
+        self.item.refresh_from_db()
+        self.assertEqual(len(results), self.orders)
+        self.assertEqual(results.count(True), self.stock)
+        self.assertEqual(self.item.quantity, 0)
+        self.assertEqual(Order.objects.filter(reserved=True).count(), self.stock)
+
+
+class OrderPaymentTest(TestCase):
+    """Оплаченный заказ нельзя оформить повторно, и он не истекает"""
+
+    order_data = {
+        "fullName": "Покупатель",
+        "email": "buyer@example.com",
+        "deliveryType": "ordinary",
+        "city": "Город",
+        "address": "Адрес",
+        "paymentType": "online",
+    }
+    payment_data = {
+        "name": "Покупатель",
+        "number": "12345678",
+        "month": "01",
+        "year": "2030",
+        "code": "123",
+    }
+
+    def setUp(self):
+        market = Market.objects.create(title="Магазин")
+        category = Category.objects.create(title="Категория")
+        self.item = Item.objects.create(
+            name="Товар",
+            market=market,
+            category=category,
+            price=10,
+            quantity=5,
+            is_published=True,
+        )
+        user = User.objects.create_user("buyer")
+        self.client.force_login(user)
+        self.order = Order.objects.create(user=user, totalCost=20)
+        OrderItem.objects.create(item=self.item, price=10, count=2, order=self.order)
+
+    def post(self, name: str, data: dict):
+        return self.client.post(
+            reverse(name, kwargs={"id": self.order.id}),
+            data,
+            content_type="application/json",
+        )
+
+    def test_pay_resubmit_expire(self):
+        self.assertEqual(self.post("make_order", self.order_data).status_code, 200)
+        self.assertEqual(self.post("payment", self.payment_data).status_code, 200)
+
+        self.assertEqual(self.post("make_order", self.order_data).status_code, 409)
+        self.assertEqual(self.post("payment", self.payment_data).status_code, 409)
+        Order.objects.filter(pk=self.order.pk).update(
+            expires_at=timezone.now() - datetime.timedelta(minutes=1)
+        )
+        self.assertEqual(Order.expire(batch_size=100), 0)
+
+        self.order.refresh_from_db()
+        self.item.refresh_from_db()
+        self.assertEqual(self.order.status, "accepted")
+        self.assertEqual(self.item.quantity, 3)
+        self.assertEqual(self.item.sold, 2)
+        self.assertEqual(Payment.objects.filter(order=self.order).count(), 1)
+
+
+class EffectivePriceRoundingTest(TestCase):
+    """Цена со скидкой округляется одинаково при сохранении и при пересчете"""
+
+    def test_half_up(self):
+        item = Item.objects.create(
+            name="Товар",
+            market=Market.objects.create(title="Магазин"),
+            category=Category.objects.create(title="Категория"),
+            price="0.25",
+            discount=50,
+        )
+        self.assertEqual(item.effective_price, Decimal("0.13"))
+
+        Item.objects.filter(pk=item.pk).update(effective_price=0)
+        Item.objects.refresh_effective_prices()
+        item.refresh_from_db()
+        self.assertEqual(item.effective_price, Decimal("0.13"))
@@ -1,13 +1,32 @@
+from decimal import Decimal
+
 from django.core.paginator import Paginator
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.db.models import QuerySet
 
 from rest_framework import generics
+from rest_framework.generics import get_object_or_404
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from users.models import Cart
+from users.cart import Cart
+from . import search
+from .banners import get_banners
+from .conditional import (
+    conditional,
+    get_catalog_stamp,
+    get_request_stamp,
+    get_item_stamp,
+    get_sales_stamp,
+    get_version_stamp,
+)
+from .facets import build_facets
+from .menu import MENU_CACHE_KEY, get_menu
+from .pagination import KeysetPaginator
+from .prices import get_price
+from .tags import TAGS_CACHE_KEY, get_category_tags, get_tags
 from .models import (
     Category,
     SubCategory,
@@ -15,6 +34,7 @@ from .models import (
     Review,
     Order,
     OrderItem,
+    order_expiration,
     Sales,
     Payment,
 )
@@ -24,10 +44,11 @@ from .serializers import (
     OrderSerializer,
     OrderItemDetailsSerializer,
     SalesSerializer,
+    build_snapshots,
 )
-from taggit.models import Tag
 
 
+@conditional(get_version_stamp(MENU_CACHE_KEY))
 class CategoryListView(APIView):
     """Представление категорий товара"""
 
@@ -35,37 +56,10 @@ class CategoryListView(APIView):
     description = "get catalog menu"
 
     def get(self, request: Request) -> Response:
-        for category in Category.objects.all():
-            category.change_status()
-
-        for subcategory in SubCategory.objects.all():
-            subcategory.change_status()
-
-        categories = [
-            {
-                "id": categories.id,
-                "title": categories.title,
-                "image": {"src": categories.image_url, "alt": "Image alt string"},
-                "subcategories": [
-                    {
-                        "id": subcategories.id,
-                        "title": subcategories.title,
-                        "image": {
-                            "src": subcategories.image_url,
-                            "alt": "Image alt string",
-                        },
-                    }
-                    for subcategories in SubCategory.objects.filter(
-                        category_id=categories.id, active=True
-                    )
-                ],
-            }
-            for categories in Category.objects.filter(active=True)
-        ]
-
-        return Response(categories)
+        return Response(get_menu())
 
 
+@conditional(get_version_stamp(TAGS_CACHE_KEY))
 class TagListView(APIView):
     """Представление тэгов"""
 
@@ -74,81 +68,80 @@ class TagListView(APIView):
 
     def get(self, request: Request) -> Response:
         if request.data:
-            tags = [
-                {"id": tag.id, "name": tag.name}
-                for tag in Tag.objects.filter(object_id=request.data["category"])
-            ]
-            return Response(tags)
-        tags = [{"id": tag.id, "name": tag.name} for tag in Tag.objects.all()]
-        return Response(tags)
+            return Response(get_category_tags(int(request.data["category"])))
+        return Response(get_tags()["all"])
 
 
+@conditional(get_catalog_stamp)
 class CatalogView(generics.ListAPIView):
     """Представление каталога"""
 
     serializer_class = CatalogSerializer
+    page_size = 6
+    sort_fields = {
+        "price": "effective_price",
+        "reviews": "review_count",
+        "date": "created_at",
+        "rating": "rating_avg",
+    }
+
+    def get_sort(self) -> tuple:
+        data = self.request.query_params
+        field = self.sort_fields.get(data.get("sort"))
+        sort_type = data.get("sortType")
+        if field is None or sort_type not in ("dec", "inc"):
+            return None, False
+        return field, sort_type == "dec"
 
-    def get_queryset(self) -> QuerySet:
+    def get_items(self) -> QuerySet:
         data = self.request.query_params
         name = data.get("filter[name]")
         min_price = int(data.get("filter[minPrice]"))
         max_price = int(data.get("filter[maxPrice]"))
         free_delivery = data.get("filter[freeDelivery]")
         available = data.get("filter[available]")
-        sort = data.get("sort")
-        sort_type = data.get("sortType")
-        limit = int(data.get("limit"))
-
+        tags = [int(tag) for tag in data.getlist("tags[]")]
+        category = data.get("category")
+        subcategory = data.get("subcategory")
+
+        items = Item.objects.filter(
+            is_published=True,
+            effective_price__gt=min_price,
+            effective_price__lt=max_price,
+        )
+        if category:
+            items = items.filter(category_id=int(category))
+        if subcategory:
+            items = items.filter(subcategory_id=int(subcategory))
         if name:
-            items = Item.objects.filter(
-                is_published=True, name__contains=name, price__gt=min_price, price__lt=max_price
-            )
-        else:
-            items = Item.objects.filter(
-                is_published=True, price__gt=min_price, price__lt=max_price
-            )
+            items = search.get_backend().search(items, name)
         if free_delivery == "true":
             items = items.filter(free_delivery=True)
 
         if available == "true":
             items = items.exclude(quantity=0)
 
-        if sort == "price":
-            if sort_type == "dec":
-                items = items.order_by("-price")
-            if sort_type == "inc":
-                items = items.order_by("price")
-
-        if sort == "reviews":
-            if sort_type == "dec":
-                items = sorted(
-                    items,
-                    key=lambda x: len(Review.objects.filter(item_id=x.id)),
-                    reverse=True,
-                )
-            if sort_type == "inc":
-                items = sorted(
-                    items, key=lambda x: len(Review.objects.filter(item_id=x.id))
-                )
+        if tags:
+            items = items.with_tags(tags, data.get("tagsMode") == "all")
 
-        if sort == "date":
-            if sort_type == "dec":
-                items = items.order_by("-created_at")
-            if sort_type == "inc":
-                items = items.order_by("created_at")
+        field, descending = self.get_sort()
+        if field:
+            prefix = "-" if descending else ""
+            items = items.order_by(prefix + field, prefix + "id")
 
-        if sort == "rating":
-            if sort_type == "dec":
-                items = sorted(items, key=lambda x: x.get_rating(), reverse=True)
-            if sort_type == "inc":
-                items = sorted(items, key=lambda x: x.get_rating())
+        return items
 
-        queryset = items[:limit]
+    def get_queryset(self) -> QuerySet:
+        limit = int(self.request.query_params.get("limit"))
+        queryset = self.get_items()[:limit]
         return queryset
 
     def get(self, request: Request, *args, **kwargs) -> Response:
+        if "cursor" in self.request.query_params:
+            return self.get_by_cursor(self.request.query_params["cursor"])
+
         items = self.get_queryset()
-        paginator = Paginator(items, 6)
+        paginator = Paginator(items, self.page_size)
         last_page = paginator.num_pages
         serializer = CatalogSerializer(
             paginator.get_page(int(self.request.query_params["currentPage"])), many=True
@@ -159,10 +152,28 @@ class CatalogView(generics.ListAPIView):
             "currentPage": int(self.request.query_params["currentPage"]),
             "lastPage": last_page,
         }
+        if self.request.query_params.get("facets") == "true":
+            response["facets"] = build_facets(self.get_items())
 
         return Response(response)
 
+    def get_by_cursor(self, cursor: str) -> Response:
+        field, descending = self.get_sort()
+        items = self.get_items()
+        if field is None and "search_rank" in items.query.annotations:
+            field, descending = "search_rank", search.get_backend().rank_descending
+        paginator = KeysetPaginator(items, self.page_size, field or "id", descending)
+        objects, next_cursor = paginator.get_page(cursor)
+        serializer = CatalogSerializer(objects, many=True)
+
+        response = {"items": serializer.data, "nextCursor": next_cursor}
+        if self.request.query_params.get("facets") == "true":
+            response["facets"] = build_facets(items)
+
+        return Response(response)
 
+
+@conditional(get_item_stamp)
 class ItemDetailsView(APIView):
     """Представление деталей товара"""
 
@@ -208,22 +219,20 @@ class ItemReviewCreateView(LoginRequiredMixin, APIView):
         return Response(serializer.get_reviews(item))
 
 
+@conditional(get_catalog_stamp)
 class ProductsPopularView(APIView):
     """Представление популярных товаров"""
 
     serializer_class = CatalogSerializer
 
     def get(self, request: Request) -> Response:
-        items = (
-            Item.objects.filter(is_published=True)
-            .order_by("sort_index", "-sales")
-            .exclude(sort_index=0)[:8]
-        )
-        serializer = CatalogSerializer(items, many=True)
+        items = Item.objects.filter(is_published=True).order_by("-popularity", "-id")
+        serializer = CatalogSerializer(items[:8], many=True)
 
         return Response(serializer.data)
 
 
+@conditional(get_catalog_stamp)
 class ProductsLimitedView(APIView):
     """Представление лимитированных товаров"""
 
@@ -236,34 +245,37 @@ class ProductsLimitedView(APIView):
         return Response(serializer.data)
 
 
+@conditional(get_catalog_stamp)
 class BannerView(APIView):
     """Представление баннеров"""
 
     serializer_class = CatalogSerializer
 
     def get(self, request: Request) -> Response:
-        items = Item.objects.filter(is_published=True)
-        Paginator(items, 4)
-        serializer = CatalogSerializer(items, many=True)
-
-        return Response(serializer.data)
+        return Response(get_banners(get_request_stamp(request, get_catalog_stamp)))
 
 
+@conditional(get_sales_stamp)
 class SalesView(APIView):
     """Представление скидок"""
 
     serializer_class = SalesSerializer
 
     def get(self, request: Request) -> Response:
-        sales = Sales.objects.select_related("item").all()
+        sales = (
+            Sales.objects.active()
+            .select_related("item")
+            .filter(item__is_published=True)
+            .order_by("dateTo", "id")
+        )
         paginator = Paginator(sales, 4)
-        last_page = paginator.num_pages
-        serializer = SalesSerializer(sales, many=True)
+        page = paginator.get_page(int(self.request.query_params["currentPage"]))
+        serializer = SalesSerializer(page, many=True)
 
         response = {
             "items": serializer.data,
-            "currentPage": int(self.request.query_params["currentPage"]),
-            "lastPage": last_page,
+            "currentPage": page.number,
+            "lastPage": paginator.num_pages,
         }
         return Response(response)
 
@@ -273,40 +285,68 @@ class OrdersListView(LoginRequiredMixin, APIView):
 
     serializer_classes = OrderSerializer, OrderItemDetailsSerializer
     serializer_class = ItemDetailsSerializer
+    page_size = 10
 
     def get(self, request: Request) -> Response:
-        Order.objects.filter(status="not_accepted").delete()
-        orders = Order.objects.order_by("-created_at").filter(user_id=request.user.id)
-        serializer = OrderSerializer(orders, many=True)
+        orders = (
+            Order.objects.order_by("-created_at")
+            .filter(user_id=request.user.id)
+            .exclude(status="not_accepted")
+        )
+        if "currentPage" not in self.request.query_params:
+            serializer = OrderSerializer(orders, many=True)
+            return Response(serializer.data)
 
-        return Response(serializer.data)
+        paginator = Paginator(orders, self.page_size)
+        page = paginator.get_page(int(self.request.query_params["currentPage"]))
+        serializer = OrderSerializer(page, many=True)
+
+        response = {
+            "items": serializer.data,
+            "currentPage": page.number,
+            "lastPage": paginator.num_pages,
+        }
+        return Response(response)
 
     def post(self, request: Request) -> Response:
-        Order.objects.filter(status="not_accepted").delete()
         order = request.data
-        items_list = []
-        total_cost = 0
-
-        for item in order:
-            total_cost += float(item["price"]) * float(item["count"])
-
-        order_obj = Order.objects.create(
-            user=request.user,
-            totalCost=total_cost,
-            fullName=request.user.profile.fullName,
-            email=request.user.email,
-            phone=request.user.profile.phone,
-            city=request.user.profile.city,
-            address=request.user.profile.address,
-            deliveryType="free",
-            paymentType="online",
+        counts = {}
+        for line in order:
+            item_id = int(line["id"])
+            counts[item_id] = counts.get(item_id, 0) + int(line["count"])
+
+        items = Item.objects.in_bulk(counts)
+        if len(items) != len(counts):
+            return Response(status=404)
+
+        prices = {item_id: get_price(item) for item_id, item in items.items()}
+        total_cost = sum(
+            (prices[item_id] * count for item_id, count in counts.items()),
+            Decimal(0),
         )
 
-        for item in order:
-            item_obj = Item.objects.get(id=item["id"])
-            items_list.append(item_obj)
-            OrderItem.objects.create(
-                item=item_obj, price=item["price"], count=item["count"], order=order_obj
+        with transaction.atomic():
+            order_obj = Order.objects.create(
+                user=request.user,
+                totalCost=total_cost,
+                fullName=request.user.profile.fullName,
+                email=request.user.email,
+                phone=request.user.profile.phone,
+                city=request.user.profile.city,
+                address=request.user.profile.address,
+                deliveryType="free",
+                paymentType="online",
+            )
+            snapshots = build_snapshots(items.values())
+            OrderItem.objects.bulk_create(
+                OrderItem(
+                    item=items[item_id],
+                    price=prices[item_id],
+                    count=count,
+                    order=order_obj,
+                    snapshot=snapshots[item_id],
+                )
+                for item_id, count in counts.items()
             )
 
         return Response({"orderId": order_obj.id})
@@ -329,7 +369,10 @@ class MakeOrderView(LoginRequiredMixin, APIView):
 
     def post(self, request, id):
         data = request.data
-        order = Order.objects.get(id=id)
+        order = get_object_or_404(Order, id=id, user_id=request.user.id)
+        if order.status not in Order.UNPAID_STATUSES or not order.reserve_stock():
+            return Response(status=409)
+
         order.fullName = data["fullName"]
         order.email = data["email"]
         order.deliveryType = data["deliveryType"]
@@ -337,6 +380,7 @@ class MakeOrderView(LoginRequiredMixin, APIView):
         order.address = data["address"]
         order.paymentType = data["paymentType"]
         order.status = "payment"
+        order.expires_at = order_expiration()
 
         order.save()
         Cart(request).clear()
@@ -354,14 +398,24 @@ class PaymentView(APIView, LoginRequiredMixin):
         year = request.data["year"]
         code = request.data["code"]
 
-        order = Order.objects.get(id=id)
-        Payment.objects.create(
-            user=request.user,
-            order=order,
-            number=number,
-            name=name,
-            payment=order.totalCost,
-        )
-        order.status = "accepted"
-        order.save()
+        with transaction.atomic():
+            order = get_object_or_404(Order, id=id)
+            accepted = (
+                Order.objects.filter(id=id)
+                .exclude(status="accepted")
+                .update(status="accepted")
+            )
+            if not accepted or not order.reserve_stock():
+                transaction.set_rollback(True)
+                return Response(status=409)
+            order.commit_stock()
+            Item.objects.increment("sold", order.get_counts())
+
+            Payment.objects.create(
+                user=request.user,
+                order=order,
+                number=number,
+                name=name,
+                payment=order.totalCost,
+            )
         return Response()
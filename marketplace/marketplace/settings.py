@@ -85,6 +85,16 @@ DATABASES = {
     }
 }
 
+# Общий для всех процессов кеш: версии меню, тэгов, баннеров и распродаж
+# и ETag по ним должны совпадать во всех воркерах
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_table",
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -140,4 +150,24 @@ LOGIN_URL = "/sign-in/"
 
 CART_SESSION_ID = "cart"
 
+CART_STORAGE = "users.cart.DatabaseCartStorage"
+
+CART_REDIS_URL = "redis://localhost:6379/0"
+
+CART_TTL = 60 * 60 * 24 * 30
+
+MENU_CACHE_TIMEOUT = 60 * 60
+
+BANNERS_CACHE_TIMEOUT = 60 * 15
+
+SALES_CACHE_TIMEOUT = 60 * 60 * 24
+
+TAGS_CACHE_TIMEOUT = 60 * 60 * 24
+
+TAGS_LOCAL_TIMEOUT = 10
+
+POPULARITY_WINDOW_DAYS = 30
+
+ORDER_EXPIRE_MINUTES = 60
+
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
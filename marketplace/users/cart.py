@@ -0,0 +1,179 @@
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from market.models import Item
+from market.prices import get_price
+from .models import CartItem
+
+
+class DatabaseCartStorage:
+    """Хранение корзин в таблице позиций корзины"""
+
+    def load(self, key: str) -> dict:
+        return {
+            str(item_id): {"id": str(item_id), "count": count, "price": str(price)}
+            for item_id, count, price in CartItem.objects.filter(
+                cart_key=key
+            ).values_list("item_id", "count", "price")
+        }
+
+    def add(self, key: str, item_id: int, count: int, price: Decimal) -> None:
+        lines = CartItem.objects.filter(cart_key=key, item_id=item_id)
+        if lines.update(count=F("count") + count, updated_at=timezone.now()):
+            return
+        try:
+            CartItem.objects.create(
+                cart_key=key, item_id=item_id, count=count, price=price
+            )
+        except IntegrityError:
+            lines.update(count=F("count") + count, updated_at=timezone.now())
+
+    def remove(self, key: str, item_id: int, count: int) -> None:
+        lines = CartItem.objects.filter(cart_key=key, item_id=item_id)
+        if not lines.filter(count__gt=count).update(
+            count=F("count") - count, updated_at=timezone.now()
+        ):
+            lines.delete()
+
+    def clear(self, key: str) -> None:
+        CartItem.objects.filter(cart_key=key).delete()
+
+    def merge(self, source: str, target: str) -> None:
+        for line in self.load(source).values():
+            self.add(target, int(line["id"]), line["count"], Decimal(line["price"]))
+        self.clear(source)
+
+
+class RedisCartStorage:
+    """Хранение корзин в Redis: хеши кол-ва и цен позиций на каждую корзину"""
+
+    def __init__(self, client=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(settings.CART_REDIS_URL)
+        self.client = client
+
+    def load(self, key: str) -> dict:
+        pipe = self.client.pipeline()
+        pipe.hgetall(f"cart:{key}:count")
+        pipe.hgetall(f"cart:{key}:price")
+        counts, prices = pipe.execute()
+        return {
+            item_id.decode(): {
+                "id": item_id.decode(),
+                "count": int(count),
+                "price": prices[item_id].decode(),
+            }
+            for item_id, count in counts.items()
+            if item_id in prices
+        }
+
+    def add(self, key: str, item_id: int, count: int, price: Decimal) -> None:
+        pipe = self.client.pipeline()
+        pipe.hsetnx(f"cart:{key}:price", item_id, str(price))
+        pipe.hincrby(f"cart:{key}:count", item_id, count)
+        pipe.expire(f"cart:{key}:price", settings.CART_TTL)
+        pipe.expire(f"cart:{key}:count", settings.CART_TTL)
+        pipe.execute()
+
+    def remove(self, key: str, item_id: int, count: int) -> None:
+        if self.client.hincrby(f"cart:{key}:count", item_id, -count) <= 0:
+            pipe = self.client.pipeline()
+            pipe.hdel(f"cart:{key}:count", item_id)
+            pipe.hdel(f"cart:{key}:price", item_id)
+            pipe.execute()
+
+    def clear(self, key: str) -> None:
+        self.client.delete(f"cart:{key}:count", f"cart:{key}:price")
+
+    def merge(self, source: str, target: str) -> None:
+        for line in self.load(source).values():
+            self.add(target, int(line["id"]), line["count"], Decimal(line["price"]))
+        self.clear(source)
+
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = import_string(settings.CART_STORAGE)()
+    return _storage
+
+
+class Cart(object):
+    def __init__(self, request):
+        self.session = request.session
+        self.storage = get_storage()
+        self.key = self.get_key(request)
+        self.cart = self.storage.load(self.key)
+
+    def get_key(self, request) -> str:
+        if request.user.is_authenticated:
+            return f"user:{request.user.id}"
+        key = self.session.get(settings.CART_SESSION_ID)
+        if not isinstance(key, str):
+            key = self.session[settings.CART_SESSION_ID] = uuid.uuid4().hex
+        return f"session:{key}"
+
+    @classmethod
+    def merge(cls, request, user) -> None:
+        """Переносит корзину анонимной сессии в корзину пользователя"""
+
+        key = request.session.pop(settings.CART_SESSION_ID, None)
+        if isinstance(key, str):
+            get_storage().merge(f"session:{key}", f"user:{user.id}")
+
+    def add(self, item, quantity):
+        item_id = str(item.id)
+
+        if item_id not in self.cart:
+            price = get_price(item)
+            self.cart[item_id] = {"id": item_id, "count": quantity, "price": str(price)}
+        else:
+            price = Decimal(self.cart[item_id]["price"])
+            self.cart[item_id]["count"] += quantity
+
+        self.storage.add(self.key, item.id, quantity, price)
+
+    def remove(self, item, count):
+        item_id = str(item.id)
+        if item_id in self.cart:
+            if self.cart[item_id]["count"] <= count:
+                del self.cart[item_id]
+            else:
+                self.cart[item_id]["count"] -= count
+            self.storage.remove(self.key, item.id, count)
+
+    def __iter__(self):
+        full_price = [0]
+        item_ids = self.cart.keys()
+        items = Item.objects.filter(id__in=item_ids)
+        for item in items:
+            self.cart[str(item.id)]["item"] = item
+
+        for value in self.cart.values():
+            value["price"] = Decimal(value["price"])
+            value["total_price"] = value["price"] * int(value["count"])
+            full_price[0] += value["total_price"]
+            yield value
+
+    def __len__(self):
+        full_price = [0]
+        for value in self.cart.values():
+            value["total_price"] = float(value["price"]) * int(value["count"])
+            full_price[0] += int(value["total_price"])
+
+        return full_price[0]
+
+    def clear(self):
+        self.storage.clear(self.key)
+        self.cart = {}
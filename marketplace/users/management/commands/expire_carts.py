@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from users.models import CartItem
+
+
+class Command(BaseCommand):
+    help = "Удаляет устаревшие корзины анонимных сессий, запускается периодически"
+
+    def handle(self, *args, **options):
+        deleted = CartItem.expire()
+        self.stdout.write(self.style.SUCCESS(f"Удалено позиций корзин: {deleted}"))
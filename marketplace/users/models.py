@@ -1,11 +1,12 @@
 import datetime
-from _decimal import Decimal
 
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models import Max
+from django.utils import timezone
 
-from market.models import Item, Sales
-from marketplace import settings
+from market.models import Item
 
 
 def profiles_avatars_directory_path(instance: "Profile", filename: str) -> str:
@@ -48,71 +49,38 @@ class Profile(models.Model):
             return self.avatar.url
 
 
-class Cart(object):
-    def __init__(self, request):
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
-
-    def add(self, item, quantity):
-        sale = Sales.objects.filter(item_id=item.id)
-        item_id = str(item.id)
-
-        if item_id not in self.cart:
-            if sale and sale[0].dateFrom <= datetime.date.today() <= sale[0].dateTo:
-                self.cart[item_id] = {
-                    "id": item_id,
-                    "count": quantity,
-                    "price": str(sale[0].salePrice),
-                }
-            else:
-                self.cart[item_id] = {
-                    "id": item_id,
-                    "count": quantity,
-                    "price": str(item.price),
-                }
-        else:
-            self.cart[item_id]["count"] += quantity
-
-        self.save()
-
-    def save(self):
-        self.session[settings.CART_SESSION_ID] = self.cart
-        self.session.modified = True
-
-    def remove(self, item, count):
-        item_id = str(item.id)
-        if item_id in self.cart:
-            if self.cart[item_id]["count"] <= count:
-                del self.cart[item_id]
-                self.save()
-            else:
-                self.cart[item_id]["count"] -= count
-                self.save()
-
-    def __iter__(self):
-        full_price = [0]
-        item_ids = self.cart.keys()
-        items = Item.objects.filter(id__in=item_ids)
-        for item in items:
-            self.cart[str(item.id)]["item"] = item
-
-        for value in self.cart.values():
-            value["price"] = Decimal(value["price"])
-            value["total_price"] = value["price"] * int(value["count"])
-            full_price[0] += value["total_price"]
-            yield value
-
-    def __len__(self):
-        full_price = [0]
-        for value in self.cart.values():
-            value["total_price"] = float(value["price"]) * int(value["count"])
-            full_price[0] += int(value["total_price"])
-
-        return full_price[0]
-
-    def clear(self):
-        del self.session[settings.CART_SESSION_ID]
-        self.session.modified = True
+class CartItem(models.Model):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cart_key", "item"], name="cart_item_unique"
+            ),
+        ]
+        verbose_name = "позиция корзины"
+        verbose_name_plural = "позиции корзины"
+
+    cart_key = models.CharField(max_length=64, verbose_name="корзина")
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, verbose_name="товар")
+    count = models.PositiveIntegerField(verbose_name="кол-во")
+    price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="цена")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="дата изменения")
+
+    @classmethod
+    def expire(cls) -> int:
+        """
+        Удаляет корзины анонимных сессий, не менявшиеся дольше CART_TTL секунд,
+        как истекают корзины в Redis
+        """
+
+        stale = (
+            cls.objects.filter(cart_key__startswith="session:")
+            .values("cart_key")
+            .annotate(last_update=Max("updated_at"))
+            .filter(
+                last_update__lt=timezone.now()
+                - datetime.timedelta(seconds=settings.CART_TTL)
+            )
+            .values("cart_key")
+        )
+        deleted, _ = cls.objects.filter(cart_key__in=stale).delete()
+        return deleted
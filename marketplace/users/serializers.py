@@ -1,8 +1,9 @@
 from rest_framework import serializers
 
 from market.models import *
+from market.serializers import PrefetchListSerializer
+from market.tags import get_category_tags
 from users.models import *
-from taggit.models import Tag
 
 
 class BasketSerializer(serializers.ModelSerializer):
@@ -32,13 +33,15 @@ class BasketSerializer(serializers.ModelSerializer):
             "reviews",
             "rating",
         ]
+        list_serializer_class = PrefetchListSerializer
+        prefetch_related = ["images"]
 
     def get_price(self, obj):
-        cart = Cart(self.context)
+        cart = self.context["cart"]
         return cart.cart[str(obj.id)]["price"]
 
     def get_count(self, obj):
-        cart = Cart(self.context)
+        cart = self.context["cart"]
         count = cart.cart[str(obj.id)]["count"]
         return count
 
@@ -56,17 +59,14 @@ class BasketSerializer(serializers.ModelSerializer):
     def get_images(self, obj):
         result = [
             {"src": image.image.url, "alt": "Image alt string"}
-            for image in ItemImage.objects.filter(item_id=obj.id)
+            for image in obj.images.all()
         ]
         if result:
             return result
         return [{"src": "", "alt": "Image alt string"}]
 
     def get_tags(self, obj):
-        return [
-            {"id": tag.id, "name": tag.name}
-            for tag in Tag.objects.filter(category=obj.category_id)
-        ]
+        return get_category_tags(obj.category_id)
 
     def get_reviews(self, obj):
         return obj.count_reviews()
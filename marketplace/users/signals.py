@@ -0,0 +1,10 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .cart import Cart
+
+
+@receiver(user_logged_in)
+def merge_cart(sender, request, user, **kwargs) -> None:
+    if request is not None:
+        Cart.merge(request, user)
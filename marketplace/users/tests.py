@@ -1,3 +1,154 @@
+import datetime
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from market.models import Category, Item, Market
+from .cart import DatabaseCartStorage, RedisCartStorage, get_storage
+from .models import CartItem
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class CartStorageTestMixin:
+    """Операции с корзиной, общие для всех хранилищ"""
+
+    def get_storage(self):
+        raise NotImplementedError
+
+    @classmethod
+    def setUpTestData(cls):
+        market = Market.objects.create(title="Магазин")
+        category = Category.objects.create(title="Категория")
+        cls.first, cls.second = [
+            Item.objects.create(
+                name=f"Товар {number}", market=market, category=category, price=10
+            )
+            for number in range(2)
+        ]
+
+    def setUp(self):
+        self.storage = self.get_storage()
+
+    def line(self, item: Item, count: int, price: str) -> dict:
+        return {"id": str(item.id), "count": count, "price": price}
+
+    def test_add(self):
+        self.storage.add("session:a", self.first.id, 1, Decimal("10.00"))
+        self.storage.add("session:a", self.first.id, 2, Decimal("12.00"))
+        self.storage.add("session:a", self.second.id, 1, Decimal("5.50"))
+
+        self.assertEqual(
+            self.storage.load("session:a"),
+            {
+                str(self.first.id): self.line(self.first, 3, "10.00"),
+                str(self.second.id): self.line(self.second, 1, "5.50"),
+            },
+        )
+        self.assertEqual(self.storage.load("session:b"), {})
+
+    def test_remove(self):
+        self.storage.add("session:a", self.first.id, 3, Decimal("10.00"))
+        self.storage.add("session:a", self.second.id, 1, Decimal("5.50"))
+
+        self.storage.remove("session:a", self.first.id, 2)
+        self.storage.remove("session:a", self.second.id, 1)
+
+        self.assertEqual(
+            self.storage.load("session:a"),
+            {str(self.first.id): self.line(self.first, 1, "10.00")},
+        )
+
+    def test_clear(self):
+        self.storage.add("session:a", self.first.id, 1, Decimal("10.00"))
+        self.storage.add("session:b", self.first.id, 1, Decimal("10.00"))
+
+        self.storage.clear("session:a")
+
+        self.assertEqual(self.storage.load("session:a"), {})
+        self.assertEqual(len(self.storage.load("session:b")), 1)
+
+    def test_merge(self):
+        self.storage.add("session:a", self.first.id, 2, Decimal("9.00"))
+        self.storage.add("session:a", self.second.id, 1, Decimal("5.50"))
+        self.storage.add("user:1", self.first.id, 1, Decimal("10.00"))
+
+        self.storage.merge("session:a", "user:1")
+
+        self.assertEqual(self.storage.load("session:a"), {})
+        self.assertEqual(
+            self.storage.load("user:1"),
+            {
+                str(self.first.id): self.line(self.first, 3, "10.00"),
+                str(self.second.id): self.line(self.second, 1, "5.50"),
+            },
+        )
+
+
+class DatabaseCartStorageTest(CartStorageTestMixin, TestCase):
+    def get_storage(self):
+        return DatabaseCartStorage()
+
+
+class CartExpireTest(TestCase):
+    """Удаляются только анонимные корзины, не менявшиеся дольше CART_TTL"""
+
+    def test_expire(self):
+        item = Item.objects.create(
+            name="Товар",
+            market=Market.objects.create(title="Магазин"),
+            category=Category.objects.create(title="Категория"),
+            price=10,
+        )
+        storage = DatabaseCartStorage()
+        for key in ("session:old", "session:new", "user:1"):
+            storage.add(key, item.id, 1, Decimal("10.00"))
+        CartItem.objects.exclude(cart_key="session:new").update(
+            updated_at=timezone.now() - datetime.timedelta(days=365)
+        )
+
+        self.assertEqual(CartItem.expire(), 1)
+        self.assertEqual(
+            sorted(CartItem.objects.values_list("cart_key", flat=True)),
+            ["session:new", "user:1"],
+        )
+
+
+@skipUnless(fakeredis, "fakeredis не установлен")
+class RedisCartStorageTest(CartStorageTestMixin, TestCase):
+    def get_storage(self):
+        return RedisCartStorage(client=fakeredis.FakeRedis())
+
+
+class CartMergeOnLoginTest(TestCase):
+    """Корзина анонимной сессии переносится в корзину пользователя при входе"""
+
+    def test_merge_on_login(self):
+        item = Item.objects.create(
+            name="Товар",
+            market=Market.objects.create(title="Магазин"),
+            category=Category.objects.create(title="Категория"),
+            price=10,
+        )
+        user = User.objects.create_user("buyer")
+
+        response = self.client.post(
+            reverse("add_to_basket"),
+            {"id": item.id, "count": 2},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.force_login(user)
 
-# Create your tests here.
+        self.assertEqual(
+            get_storage().load(f"user:{user.id}")[str(item.id)]["count"], 2
+        )
+        response = self.client.get(reverse("cart"))
+        self.assertEqual([line["count"] for line in response.json()], [2])
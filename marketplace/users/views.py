@@ -12,7 +12,8 @@ from rest_framework.views import APIView
 from market.models import Item
 
 from .serializers import BasketSerializer
-from .models import Profile, Cart
+from .cart import Cart
+from .models import Profile
 
 
 class UserLogoutView(LogoutView):
@@ -112,39 +113,25 @@ class CartView(APIView):
 
     serializer_class = BasketSerializer
 
-    def get_queryset(self, id: int) -> QuerySet:
-        queryset = Item.objects.get(id=id)
+    def get_queryset(self, cart: Cart) -> QuerySet:
+        queryset = Item.objects.filter(id__in=cart.cart.keys()).order_by("id")
         return queryset
 
-    def get(self, request: Request) -> Response:
-        cart = Cart(request)
-        items = [self.get_queryset(int(item_id)) for item_id in cart.cart.keys()]
+    def get_response(self, cart: Cart) -> Response:
+        items = self.get_queryset(cart)
 
-        if not items:
+        if not cart.cart:
             return Response(None)
 
-        serializer = BasketSerializer(items, many=True, context=request)
+        serializer = BasketSerializer(items, many=True, context={"cart": cart})
         return Response(serializer.data)
 
-
-class BasketView(APIView):
-    """Представление добавления и удаления из карзины"""
-
-    serializer_class = BasketSerializer
-
-    def get_queryset(self, id: int) -> QuerySet:
-        queryset = Item.objects.get(id=id)
-        return queryset
-
     def get(self, request: Request) -> Response:
-        cart = Cart(request)
-        items = [self.get_queryset(int(item_id)) for item_id in cart.cart.keys()]
+        return self.get_response(Cart(request))
 
-        if not items:
-            return Response(None)
 
-        serializer = BasketSerializer(items, many=True, context=request)
-        return Response(serializer.data)
+class BasketView(CartView):
+    """Представление добавления и удаления из карзины"""
 
     def post(self, request: Request) -> Response:
         data = request.data
@@ -155,11 +142,7 @@ class BasketView(APIView):
             quantity=data["count"],
         )
 
-        items = [self.get_queryset(int(item_id)) for item_id in cart.cart.keys()]
-        if not items:
-            return Response(None)
-        serializer = BasketSerializer(items, many=True, context=request)
-        return Response(serializer.data)
+        return self.get_response(cart)
 
     def delete(self, request: Request) -> Response:
         cart = Cart(request)
@@ -167,8 +150,4 @@ class BasketView(APIView):
         item = Item.objects.get(id=data["id"])
         cart.remove(item, data["count"])
 
-        items = [self.get_queryset(int(item_id)) for item_id in cart.cart.keys()]
-        if not items:
-            return Response(None)
-        serializer = BasketSerializer(items, many=True, context=request)
-        return Response(serializer.data)
+        return self.get_response(cart)